@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# benchmark of JSEncoder against the recursive pyobj2js function that it has replaced.
+# this script does not need qgis. run it with python 2.7 from the plugin directory:
+#   python benchmarks/bench_jsencoder.py
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from jsencoder import JSEncoder
+
+
+class Null:
+  # stands in for qgis.core.NULL
+  def __eq__(self, other):
+    return isinstance(other, Null)
+
+  def __ne__(self, other):
+    return not self.__eq__(other)
+
+NULL = Null()
+
+
+def pyobj2js(obj, escape=False, quoteHex=True):
+  # pyobj2js of version 0.7.x
+  if isinstance(obj, dict):
+    items = [u"{0}:{1}".format(k, pyobj2js(v, escape, quoteHex)) for k, v in obj.iteritems()]
+    return "{" + ",".join(items) + "}"
+  elif isinstance(obj, list):
+    items = [unicode(pyobj2js(v, escape, quoteHex)) for v in obj]
+    return "[" + ",".join(items) + "]"
+  elif isinstance(obj, bool):
+    return "true" if obj else "false"
+  elif isinstance(obj, (str, unicode)):
+    if escape:
+      return '"' + obj.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    if not quoteHex and re.match("0x[0-9A-Fa-f]+$", obj):
+      return obj
+    return '"' + obj + '"'
+  elif isinstance(obj, (int, float)):
+    return obj
+  elif obj == NULL:
+    return "null"
+  return '"' + str(obj) + '"'
+
+
+def normalize(s):
+  # str() writes integral floats with ".0" (e.g. 10.0), which JSEncoder writes
+  # as integers (e.g. 10). both are the same number in javascript.
+  return re.sub(r"(?<![\d.e])(\d+)\.0(?![\d])", r"\1", s)
+
+
+def payloads():
+  rnd = random.Random(0)
+  dem = [rnd.uniform(0, 3000) for i in range(257 * 257)]
+  lines = [{"m": 0, "lines": [[[rnd.uniform(-100, 100), rnd.uniform(-100, 100), rnd.uniform(0, 50)] for k in range(50)] for j in range(2)]} for i in range(200)]
+  polygons = [{"m": 1, "h": 10.0, "polygons": [[[[rnd.uniform(-100, 100), rnd.uniform(-100, 100)] for k in range(30)]]]} for i in range(200)]
+  materials = [{"type": 0, "c": "0x%06x" % rnd.randint(0, 0xffffff), "o": 0.8} for i in range(500)]
+  attrs = [[i, u"name %d" % i, u'quoted "%d"' % i, rnd.uniform(0, 1000), NULL] for i in range(2000)]
+  return [("257x257 DEM grid list", dem, {}),
+          ("line features (200 x 2 x 50 xyz)", lines, {}),
+          ("polygon features (200 x 30 xy)", polygons, {}),
+          ("materials (500, hex colors)", materials, {"quoteHex": False}),
+          ("attribute rows (2000, mixed)", attrs, {"escape": True})]
+
+
+def main(repeat=9, number=5):
+  print("python %s, best of %d x %d runs" % (sys.version.split()[0], repeat, number))
+  for title, obj, opts in payloads():
+    encoder = JSEncoder(opts.get("escape", False), opts.get("quoteHex", True), null=NULL)
+    old = unicode(pyobj2js(obj, **opts))
+    new = encoder.encode(obj)
+    if normalize(old) != normalize(new):
+      print("%-36s outputs differ" % title)
+      continue
+
+    t_old = min(timeit.repeat(lambda: pyobj2js(obj, **opts), repeat=repeat, number=number))
+    t_new = min(timeit.repeat(lambda: encoder.encode(obj), repeat=repeat, number=number))
+    print("%-36s %8.1f ms %8.1f ms  x%.1f" % (title, t_old * 1000 / number, t_new * 1000 / number, t_old / t_new))
+
+
+if __name__ == "__main__":
+  main()
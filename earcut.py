@@ -0,0 +1,618 @@
+# -*- coding: utf-8 -*-
+"""
+Polygon triangulation by ear clipping with hole elimination.
+Python port of earcut (https://github.com/mapbox/earcut).
+
+ISC License
+
+Copyright (c) 2016, Mapbox
+
+Permission to use, copy, modify, and/or distribute this software for any purpose
+with or without fee is hereby granted, provided that the above copyright notice
+and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND ISC DISCLAIMS ALL WARRANTIES WITH REGARD TO
+THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS.
+IN NO EVENT SHALL ISC BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR
+CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA
+OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION,
+ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+# Outline of the algorithm:
+#  - holes are joined to the outer ring with bridges
+#  - ears are looked up with a z-order curve hash for large rings
+
+
+class Node:
+  __slots__ = ("i", "x", "y", "prev", "next", "z", "prevZ", "nextZ", "steiner")
+
+  def __init__(self, i, x, y):
+    self.i = i
+    self.x = x
+    self.y = y
+    self.prev = None
+    self.next = None
+    self.z = None
+    self.prevZ = None
+    self.nextZ = None
+    self.steiner = False
+
+
+def triangulate(polygon):
+  """triangulate a polygon given as a list of rings (outer ring first, then holes).
+
+  each ring is a list of [x, y, ...] points and may be closed (last point equal to first).
+  returns a tuple of vertex list ([x, y] of ring points without closing points, in order of rings)
+  and a flat list of vertex indices. every triangle is counter-clockwise.
+  """
+  vertices = []
+  holeIndices = []
+  for i, ring in enumerate(polygon):
+    if len(ring) > 1 and ring[0][0] == ring[-1][0] and ring[0][1] == ring[-1][1]:
+      ring = ring[:-1]
+    if i:
+      holeIndices.append(len(vertices))
+    vertices += [[pt[0], pt[1]] for pt in ring]
+
+  data = []
+  for v in vertices:
+    data += v
+  indices = earcut(data, holeIndices)
+
+  # make every triangle counter-clockwise
+  for t in range(0, len(indices), 3):
+    a, b, c = vertices[indices[t]], vertices[indices[t + 1]], vertices[indices[t + 2]]
+    if (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0]) < 0:
+      indices[t + 1], indices[t + 2] = indices[t + 2], indices[t + 1]
+
+  return vertices, indices
+
+
+def earcut(data, holeIndices=None, dim=2):
+  """triangulate a polygon given as flat coordinate list. returns a flat list of vertex indices."""
+  hasHoles = bool(holeIndices)
+  outerLen = holeIndices[0] * dim if hasHoles else len(data)
+  outerNode = linkedList(data, 0, outerLen, dim, True)
+  triangles = []
+
+  if outerNode is None or outerNode.next is outerNode.prev:
+    return triangles
+
+  if hasHoles:
+    outerNode = eliminateHoles(data, holeIndices, outerNode, dim)
+
+  minX = minY = invSize = 0
+  # if the shape is not too simple, use z-order curve hash later
+  if len(data) > 80 * dim:
+    xs = data[0:outerLen:dim]
+    ys = data[1:outerLen:dim]
+    minX, minY = min(xs), min(ys)
+    invSize = max(max(xs) - minX, max(ys) - minY)
+    invSize = 32767.0 / invSize if invSize else 0
+
+  earcutLinked(outerNode, triangles, dim, minX, minY, invSize, 0)
+  return triangles
+
+
+def linkedList(data, start, end, dim, clockwise):
+  # create a circular doubly linked list from polygon points in the specified winding order
+  last = None
+  if clockwise == (signedArea(data, start, end, dim) > 0):
+    for i in range(start, end, dim):
+      last = insertNode(i, data[i], data[i + 1], last)
+  else:
+    for i in range(end - dim, start - 1, -dim):
+      last = insertNode(i, data[i], data[i + 1], last)
+
+  if last is not None and equals(last, last.next):
+    removeNode(last)
+    last = last.next
+  return last
+
+
+def filterPoints(start, end=None):
+  # eliminate colinear or duplicate points
+  if start is None:
+    return start
+  if end is None:
+    end = start
+
+  p = start
+  while True:
+    again = False
+    if not p.steiner and (equals(p, p.next) or area(p.prev, p, p.next) == 0):
+      removeNode(p)
+      p = end = p.prev
+      if p is p.next:
+        break
+      again = True
+    else:
+      p = p.next
+
+    if not again and p is end:
+      break
+  return end
+
+
+def earcutLinked(ear, triangles, dim, minX, minY, invSize, stage):
+  # main ear slicing loop which triangulates a polygon (given as a linked list)
+  if ear is None:
+    return
+
+  # interlink polygon nodes in z-order
+  if not stage and invSize:
+    indexCurve(ear, minX, minY, invSize)
+
+  stop = ear
+  # iterate through ears, slicing them one by one
+  while ear.prev is not ear.next:
+    prev = ear.prev
+    next = ear.next
+
+    if (isEarHashed(ear, minX, minY, invSize) if invSize else isEar(ear)):
+      # cut off the triangle
+      triangles += [prev.i // dim, ear.i // dim, next.i // dim]
+      removeNode(ear)
+
+      # skipping the next vertex leads to less sliver triangles
+      ear = next.next
+      stop = next.next
+      continue
+
+    ear = next
+
+    # if we looped through the whole remaining polygon and can't find any more ears
+    if ear is stop:
+      if not stage:
+        # try filtering points and slicing again
+        earcutLinked(filterPoints(ear), triangles, dim, minX, minY, invSize, 1)
+      elif stage == 1:
+        # if this didn't work, try curing all small self-intersections locally
+        ear = cureLocalIntersections(filterPoints(ear), triangles, dim)
+        earcutLinked(ear, triangles, dim, minX, minY, invSize, 2)
+      elif stage == 2:
+        # as a last resort, try splitting the remaining polygon into two
+        splitEarcut(ear, triangles, dim, minX, minY, invSize)
+      break
+
+
+def isEar(ear):
+  # check whether a polygon node forms a valid ear with adjacent nodes
+  a, b, c = ear.prev, ear, ear.next
+  if area(a, b, c) >= 0:
+    return False    # reflex, can't be an ear
+
+  # now make sure we don't have other points inside the potential ear
+  p = ear.next.next
+  while p is not ear.prev:
+    if pointInTriangle(a.x, a.y, b.x, b.y, c.x, c.y, p.x, p.y) and area(p.prev, p, p.next) >= 0:
+      return False
+    p = p.next
+  return True
+
+
+def isEarHashed(ear, minX, minY, invSize):
+  a, b, c = ear.prev, ear, ear.next
+  if area(a, b, c) >= 0:
+    return False
+
+  # triangle bbox
+  minTX = min(a.x, b.x, c.x)
+  minTY = min(a.y, b.y, c.y)
+  maxTX = max(a.x, b.x, c.x)
+  maxTY = max(a.y, b.y, c.y)
+
+  # z-order range for the current triangle bbox
+  minZ = zOrder(minTX, minTY, minX, minY, invSize)
+  maxZ = zOrder(maxTX, maxTY, minX, minY, invSize)
+
+  p = ear.prevZ
+  n = ear.nextZ
+
+  # look for points inside the triangle in both directions
+  while p is not None and p.z >= minZ and n is not None and n.z <= maxZ:
+    if (p is not ear.prev and p is not ear.next and
+        pointInTriangle(a.x, a.y, b.x, b.y, c.x, c.y, p.x, p.y) and area(p.prev, p, p.next) >= 0):
+      return False
+    p = p.prevZ
+
+    if (n is not ear.prev and n is not ear.next and
+        pointInTriangle(a.x, a.y, b.x, b.y, c.x, c.y, n.x, n.y) and area(n.prev, n, n.next) >= 0):
+      return False
+    n = n.nextZ
+
+  # look for remaining points in decreasing z-order
+  while p is not None and p.z >= minZ:
+    if (p is not ear.prev and p is not ear.next and
+        pointInTriangle(a.x, a.y, b.x, b.y, c.x, c.y, p.x, p.y) and area(p.prev, p, p.next) >= 0):
+      return False
+    p = p.prevZ
+
+  # look for remaining points in increasing z-order
+  while n is not None and n.z <= maxZ:
+    if (n is not ear.prev and n is not ear.next and
+        pointInTriangle(a.x, a.y, b.x, b.y, c.x, c.y, n.x, n.y) and area(n.prev, n, n.next) >= 0):
+      return False
+    n = n.nextZ
+
+  return True
+
+
+def cureLocalIntersections(start, triangles, dim):
+  # go through all polygon nodes and cure small local self-intersections
+  p = start
+  while True:
+    a = p.prev
+    b = p.next.next
+
+    if not equals(a, b) and intersects(a, p, p.next, b) and locallyInside(a, b) and locallyInside(b, a):
+      triangles += [a.i // dim, p.i // dim, b.i // dim]
+
+      # remove two nodes involved
+      removeNode(p)
+      removeNode(p.next)
+      p = start = b
+
+    p = p.next
+    if p is start:
+      break
+  return filterPoints(p)
+
+
+def splitEarcut(start, triangles, dim, minX, minY, invSize):
+  # try splitting polygon into two and triangulate them independently
+  a = start
+  while True:
+    b = a.next.next
+    while b is not a.prev:
+      if a.i != b.i and isValidDiagonal(a, b):
+        # split the polygon in two by the diagonal
+        c = splitPolygon(a, b)
+
+        # filter colinear points around the cuts
+        a = filterPoints(a, a.next)
+        c = filterPoints(c, c.next)
+
+        # run earcut on each half
+        earcutLinked(a, triangles, dim, minX, minY, invSize, 0)
+        earcutLinked(c, triangles, dim, minX, minY, invSize, 0)
+        return
+      b = b.next
+    a = a.next
+    if a is start:
+      break
+
+
+def eliminateHoles(data, holeIndices, outerNode, dim):
+  # link every hole into the outer loop, producing a single-ring polygon without holes
+  queue = []
+  length = len(holeIndices)
+  for i in range(length):
+    start = holeIndices[i] * dim
+    end = holeIndices[i + 1] * dim if i < length - 1 else len(data)
+    node = linkedList(data, start, end, dim, False)
+    if node is None:
+      continue
+    if node is node.next:
+      node.steiner = True
+    queue.append(getLeftmost(node))
+
+  queue.sort(key=lambda node: node.x)
+
+  # process holes from left to right
+  for hole in queue:
+    outerNode = eliminateHole(hole, outerNode)
+  return outerNode
+
+
+def eliminateHole(hole, outerNode):
+  # find a bridge between vertices that connects hole with an outer ring and link it
+  bridge = findHoleBridge(hole, outerNode)
+  if bridge is None:
+    return outerNode
+
+  bridgeReverse = splitPolygon(bridge, hole)
+
+  # filter collinear points around the cuts
+  filterPoints(bridgeReverse, bridgeReverse.next)
+  return filterPoints(bridge, bridge.next)
+
+
+def findHoleBridge(hole, outerNode):
+  # David Eberly's algorithm for finding a bridge between hole and outer polygon
+  p = outerNode
+  hx = hole.x
+  hy = hole.y
+  qx = float("-inf")
+  m = None
+
+  # find a segment intersected by a ray from the hole's leftmost point to the left.
+  # segment's endpoint with lesser x will be potential connection point
+  while True:
+    if hy <= p.y and hy >= p.next.y and p.next.y != p.y:
+      x = p.x + float(hy - p.y) * (p.next.x - p.x) / (p.next.y - p.y)
+      if x <= hx and x > qx:
+        qx = x
+        m = p if p.x < p.next.x else p.next
+        if x == hx:
+          return m    # hole touches outer segment; pick leftmost endpoint
+    p = p.next
+    if p is outerNode:
+      break
+
+  if m is None:
+    return None
+
+  # look for points inside the triangle of hole point, segment intersection and endpoint.
+  # if there are no points found, we have a valid connection.
+  # otherwise choose the point of the minimum angle with the ray as connection point
+  stop = m
+  mx = m.x
+  my = m.y
+  tanMin = float("inf")
+
+  p = m
+  while True:
+    if (hx >= p.x and p.x >= mx and hx != p.x and
+        pointInTriangle(hx if hy < my else qx, hy, mx, my, qx if hy < my else hx, hy, p.x, p.y)):
+
+      tan = abs(hy - p.y) / float(hx - p.x)   # tangential
+
+      if locallyInside(p, hole) and (tan < tanMin or (tan == tanMin and (p.x > m.x or (p.x == m.x and sectorContainsSector(m, p))))):
+        m = p
+        tanMin = tan
+
+    p = p.next
+    if p is stop:
+      break
+
+  return m
+
+
+def sectorContainsSector(m, p):
+  # whether sector in vertex m contains sector in vertex p in the same coordinates
+  return area(m.prev, m, p.prev) < 0 and area(p.next, m, m.next) < 0
+
+
+def indexCurve(start, minX, minY, invSize):
+  # interlink polygon nodes in z-order
+  p = start
+  while True:
+    if p.z is None:
+      p.z = zOrder(p.x, p.y, minX, minY, invSize)
+    p.prevZ = p.prev
+    p.nextZ = p.next
+    p = p.next
+    if p is start:
+      break
+
+  p.prevZ.nextZ = None
+  p.prevZ = None
+
+  sortLinked(p)
+
+
+def sortLinked(lst):
+  # Simon Tatham's linked list merge sort algorithm
+  inSize = 1
+  while True:
+    p = lst
+    lst = None
+    tail = None
+    numMerges = 0
+
+    while p is not None:
+      numMerges += 1
+      q = p
+      pSize = 0
+      for i in range(inSize):
+        pSize += 1
+        q = q.nextZ
+        if q is None:
+          break
+      qSize = inSize
+
+      while pSize > 0 or (qSize > 0 and q is not None):
+        if pSize != 0 and (qSize == 0 or q is None or p.z <= q.z):
+          e = p
+          p = p.nextZ
+          pSize -= 1
+        else:
+          e = q
+          q = q.nextZ
+          qSize -= 1
+
+        if tail is not None:
+          tail.nextZ = e
+        else:
+          lst = e
+
+        e.prevZ = tail
+        tail = e
+
+      p = q
+
+    tail.nextZ = None
+    inSize *= 2
+
+    if numMerges <= 1:
+      return lst
+
+
+def zOrder(x, y, minX, minY, invSize):
+  # z-order of a point given coords and inverse of the longer side of data bbox
+  x = int((x - minX) * invSize)
+  y = int((y - minY) * invSize)
+
+  x = (x | (x << 8)) & 0x00FF00FF
+  x = (x | (x << 4)) & 0x0F0F0F0F
+  x = (x | (x << 2)) & 0x33333333
+  x = (x | (x << 1)) & 0x55555555
+
+  y = (y | (y << 8)) & 0x00FF00FF
+  y = (y | (y << 4)) & 0x0F0F0F0F
+  y = (y | (y << 2)) & 0x33333333
+  y = (y | (y << 1)) & 0x55555555
+
+  return x | (y << 1)
+
+
+def getLeftmost(start):
+  # find the leftmost node of a polygon ring
+  p = start
+  leftmost = start
+  while True:
+    if p.x < leftmost.x or (p.x == leftmost.x and p.y < leftmost.y):
+      leftmost = p
+    p = p.next
+    if p is start:
+      break
+  return leftmost
+
+
+def pointInTriangle(ax, ay, bx, by, cx, cy, px, py):
+  # check if a point lies within a convex triangle
+  return ((cx - px) * (ay - py) >= (ax - px) * (cy - py) and
+          (ax - px) * (by - py) >= (bx - px) * (ay - py) and
+          (bx - px) * (cy - py) >= (cx - px) * (by - py))
+
+
+def isValidDiagonal(a, b):
+  # check if a diagonal between two polygon nodes is valid (lies in polygon interior)
+  return (a.next.i != b.i and a.prev.i != b.i and not intersectsPolygon(a, b) and    # doesn't intersect other edges
+          ((locallyInside(a, b) and locallyInside(b, a) and middleInside(a, b) and    # locally visible
+            (area(a.prev, a, b.prev) or area(a, b.prev, b))) or                       # does not create opposite-facing sectors
+           (equals(a, b) and area(a.prev, a, a.next) > 0 and area(b.prev, b, b.next) > 0)))   # special zero-length case
+
+
+def area(p, q, r):
+  # signed area of a triangle
+  return (q.y - p.y) * (r.x - q.x) - (q.x - p.x) * (r.y - q.y)
+
+
+def equals(p1, p2):
+  # check if two points are equal
+  return p1.x == p2.x and p1.y == p2.y
+
+
+def sign(num):
+  return (num > 0) - (num < 0)
+
+
+def onSegment(p, q, r):
+  # for collinear points p, q, r, check if point q lies on segment pr
+  return q.x <= max(p.x, r.x) and q.x >= min(p.x, r.x) and q.y <= max(p.y, r.y) and q.y >= min(p.y, r.y)
+
+
+def intersects(p1, q1, p2, q2):
+  # check if two segments intersect
+  o1 = sign(area(p1, q1, p2))
+  o2 = sign(area(p1, q1, q2))
+  o3 = sign(area(p2, q2, p1))
+  o4 = sign(area(p2, q2, q1))
+
+  if o1 != o2 and o3 != o4:
+    return True   # general case
+
+  if o1 == 0 and onSegment(p1, p2, q1):
+    return True   # p1, q1 and p2 are collinear and p2 lies on p1q1
+  if o2 == 0 and onSegment(p1, q2, q1):
+    return True   # p1, q1 and q2 are collinear and q2 lies on p1q1
+  if o3 == 0 and onSegment(p2, p1, q2):
+    return True   # p2, q2 and p1 are collinear and p1 lies on p2q2
+  if o4 == 0 and onSegment(p2, q1, q2):
+    return True   # p2, q2 and q1 are collinear and q1 lies on p2q2
+  return False
+
+
+def intersectsPolygon(a, b):
+  # check if a polygon diagonal intersects any polygon segments
+  p = a
+  while True:
+    if p.i != a.i and p.next.i != a.i and p.i != b.i and p.next.i != b.i and intersects(p, p.next, a, b):
+      return True
+    p = p.next
+    if p is a:
+      break
+  return False
+
+
+def locallyInside(a, b):
+  # check if a polygon diagonal is locally inside the polygon
+  if area(a.prev, a, a.next) < 0:
+    return area(a, b, a.next) >= 0 and area(a, a.prev, b) >= 0
+  return area(a, b, a.prev) < 0 or area(a, a.next, b) < 0
+
+
+def middleInside(a, b):
+  # check if the middle point of a polygon diagonal is inside the polygon
+  p = a
+  inside = False
+  px = (a.x + b.x) / 2.0
+  py = (a.y + b.y) / 2.0
+  while True:
+    if (((p.y > py) != (p.next.y > py)) and p.next.y != p.y and
+        (px < float(p.next.x - p.x) * (py - p.y) / (p.next.y - p.y) + p.x)):
+      inside = not inside
+    p = p.next
+    if p is a:
+      break
+  return inside
+
+
+def splitPolygon(a, b):
+  # link two polygon vertices with a bridge; if the vertices belong to the same ring, it splits
+  # polygon into two; if one belongs to the outer ring and another to a hole, it merges it into a
+  # single ring
+  a2 = Node(a.i, a.x, a.y)
+  b2 = Node(b.i, b.x, b.y)
+  an = a.next
+  bp = b.prev
+
+  a.next = b
+  b.prev = a
+
+  a2.next = an
+  an.prev = a2
+
+  b2.next = a2
+  a2.prev = b2
+
+  bp.next = b2
+  b2.prev = bp
+
+  return b2
+
+
+def insertNode(i, x, y, last):
+  # create a node and optionally link it with previous one (in a circular doubly linked list)
+  p = Node(i, x, y)
+
+  if last is None:
+    p.prev = p
+    p.next = p
+  else:
+    p.next = last.next
+    p.prev = last
+    last.next.prev = p
+    last.next = p
+  return p
+
+
+def removeNode(p):
+  p.next.prev = p.prev
+  p.prev.next = p.next
+
+  if p.prevZ is not None:
+    p.prevZ.nextZ = p.nextZ
+  if p.nextZ is not None:
+    p.nextZ.prevZ = p.prevZ
+
+
+def signedArea(data, start, end, dim):
+  s = 0
+  j = end - dim
+  for i in range(start, end, dim):
+    s += (data[j] - data[i]) * (data[i + 1] + data[j + 1])
+    j = i
+  return s
@@ -16,6 +16,7 @@ Q3D.Options = {
   frame: {color: 0},
   label: {visible: true, connectorColor: 0xc0c0d0, autoSize: false, minFontSize: 10},
   qmarker: {r: 0.25, c: 0xffff00, o: 0.8},
+  dem: {maxScreenSpaceError: 2},    // in pixels. used to select tiles of DEM pyramid
   exportMode: false
 };
 
@@ -143,6 +144,7 @@ Q3D.application = {
     this.labelConnectorGroup = new THREE.Object3D();
     this.labelVisibility = Q3D.Options.label.visible;
     this.labels = [];     // labels of visible layers
+    this.pyramidLayers = [];
 
     // root element for labels
     var e = document.createElement("div");
@@ -191,6 +193,7 @@ Q3D.application = {
 
     // build models
     project.layers.forEach(function (layer) {
+      if (layer.dq) layer.dequantize();
       layer.initMaterials();
       layer.build(this.scene);
       if (layer.queryableObjects.length) this.queryableObjects = this.queryableObjects.concat(layer.queryableObjects);
@@ -204,6 +207,9 @@ Q3D.application = {
 
     if (this.labels.length) this.scene.add(this.labelConnectorGroup);
 
+    // layers that load tiles on demand
+    this.pyramidLayers = project.layers.filter(function (layer) { return layer.pt !== undefined; });
+
     // restore view from URL parameters
     this._restoreViewFromUrl();
 
@@ -323,6 +329,9 @@ Q3D.application = {
   },
 
   render: function () {
+    for (var i = 0, l = this.pyramidLayers.length; i < l; i++) {
+      this.pyramidLayers[i].updatePyramid(this.camera, this.height);
+    }
     this.renderer.render(this.scene, this.camera);
     this.updateLabelPosition();
   },
@@ -448,8 +457,16 @@ Q3D.application = {
     this.popup.showHTML(html);
   },
 
+  // id of the feature of intersected object. merged objects have ids of features of instances
+  featureIdOfIntersection: function (obj) {
+    var userData = obj.object.userData;
+    if (userData.featureIds === undefined) return userData.featureId;
+    return userData.featureIds[Math.floor(obj.indices[0] / userData.vertexCount)];
+  },
+
   showQueryResult: function (obj) {
-    var userData = obj.object.userData, layer, r = [];
+    var userData = obj.object.userData, featureId = this.featureIdOfIntersection(obj), layer, r = [];
+    this._queriedObject = obj;
     if (userData.layerId !== undefined) {
       // layer name
       layer = this.project.layers[userData.layerId];
@@ -473,13 +490,22 @@ Q3D.application = {
 
     r.push("</td></tr></table>");
 
-    if (userData.layerId !== undefined && userData.featureId !== undefined && layer.a !== undefined) {
+    if (userData.layerId !== undefined && featureId !== undefined && layer.a !== undefined) {
       // attributes
       r.push('<table class="attrs">');
       r.push("<caption>Attributes</caption>");
-      var f = layer.f[userData.featureId];
-      for (var i = 0, l = layer.a.length; i < l; i++) {
-        r.push("<tr><td>" + layer.a[i] + "</td><td>" + f.a[i] + "</td></tr>");
+      var f = layer.f[featureId];
+      if (f.a === undefined) {
+        // attributes have not been loaded yet. show the result again when they are loaded.
+        r.push("<tr><td>Loading...</td></tr>");
+        layer.loadAttributes(featureId, function () {
+          if (this._queriedObject === obj) this.showQueryResult(obj);
+        }.bind(this));
+      }
+      else {
+        for (var i = 0, l = layer.a.length; i < l; i++) {
+          r.push("<tr><td>" + layer.a[i] + "</td><td>" + layer.getAttribute(f, i) + "</td></tr>");
+        }
       }
       r.push("</table>");
     }
@@ -488,6 +514,7 @@ Q3D.application = {
 
   closePopup: function () {
     this.popup.hide();
+    this._queriedObject = null;
     this.queryMarker.visible = false;
     this.highlightFeature(null, null);
     if (this._canvasImageUrl) {
@@ -506,6 +533,12 @@ Q3D.application = {
       for (var i = 0, l = f.objs.length; i < l; i++) {
         f.objs[i].traverse(setMaterial);
       }
+      if (this._highlightObjects) {
+        this._highlightObjects.forEach(function (obj) {
+          obj.parent.remove(obj);
+        });
+        this._highlightObjects = null;
+      }
       this.selectedLayerId = null;
       this.selectedFeatureId = null;
       this._originalMaterial = null;
@@ -518,12 +551,25 @@ Q3D.application = {
     if (layer.objType == "Icon" || layer.objType == "JSON model") return;
 
     var f = layer.f[featureId];
-    if (f === undefined || f.objs.length == 0) return;
+    if (f === undefined) return;
 
-    this._originalMaterial = layer.materials[f.m].m;
     var high_mat = this.highlightMaterial;
     high_mat.color = layer.materials[f.m].m.color;
     //high_mat.ambient = layer.materials[f.m].m.ambient;
+
+    if (layer.baseGeometry !== undefined && f.objs.length == 0) {
+      // instances of the feature are merged with other features. draw them again over the merged meshes
+      this._highlightObjects = layer.createFeatureMeshes(featureId, high_mat);
+      this._highlightObjects.forEach(function (obj) {
+        layer.objectGroup.add(obj);
+      });
+      this.selectedLayerId = layerId;
+      this.selectedFeatureId = featureId;
+      return;
+    }
+    if (f.objs.length == 0) return;
+
+    this._originalMaterial = layer.materials[f.m].m;
     var setMaterial = function (obj) {
       obj.material = high_mat;
     };
@@ -547,9 +593,9 @@ Q3D.application = {
         this.queryMarker.visible = true;
 
         // highlight clicked object
-        var userData = obj.object.userData;
+        var userData = obj.object.userData, featureId = this.featureIdOfIntersection(obj);
         this.highlightFeature((userData.layerId === undefined) ? null : userData.layerId,
-                              (userData.featureId === undefined) ? null : userData.featureId);
+                              (featureId === undefined) ? null : featureId);
 
         this.showQueryResult(obj);
         return;
@@ -671,6 +717,8 @@ Q3D.DEMBlock.prototype = {
   constructor: Q3D.DEMBlock,
 
   build: function (layer) {
+    if (this.qm !== undefined) this.decodeQuantizedMesh();
+
     var geom = new THREE.PlaneGeometry(this.plane.width, this.plane.height,
                                        this.width - 1, this.height - 1);
 
@@ -679,13 +727,37 @@ Q3D.DEMBlock.prototype = {
       geom.vertices[i].z = this.data[i];
     }
 
+    // texture coordinates in texture atlas ([offsetX, offsetY, scaleX, scaleY])
+    if (this.uv !== undefined) {
+      var uv = this.uv;
+      geom.faceVertexUvs[0].forEach(function (uvs) {
+        for (var i = 0; i < 3; i++) {
+          uvs[i] = new THREE.Vector2(uv[0] + uvs[i].x * uv[2], uv[1] + uvs[i].y * uv[3]);
+        }
+      });
+    }
+
     // Calculate normals
     if (this.shading) {
       geom.computeFaceNormals();
       geom.computeVertexNormals();
     }
 
-    var mesh = new THREE.Mesh(geom, layer.materials[this.m].m);
+    var material;
+    if (this.m !== undefined) material = layer.materials[this.m].m;
+    else {
+      // block has its own texture (tile of DEM pyramid). the material is added to the layer materials
+      // so that layer opacity applies to tiles, including ones loaded after it has been changed.
+      var opt = {map: Q3D.Utils.loadTextureData(this.t.data)};
+      if (layer.opacity < 1) {
+        opt.opacity = layer.opacity;
+        opt.transparent = true;
+      }
+      material = new THREE.MeshPhongMaterial(opt);
+      layer.materials.push({type: Q3D.MaterialType.MeshPhong, m: material});
+    }
+
+    var mesh = new THREE.Mesh(geom, material);
     if (this.plane.offsetX != 0) mesh.position.x = this.plane.offsetX;
     if (this.plane.offsetY != 0) mesh.position.y = this.plane.offsetY;
     mesh.userData.layerId = layer.index;
@@ -693,6 +765,21 @@ Q3D.DEMBlock.prototype = {
     layer.addObject(mesh);
   },
     
+  // Decode quantized mesh (see quantizedmesh.py), and restore grid values for getZ and sides
+  decodeQuantizedMesh: function () {
+    var qm = this.qm,
+        zScale = (qm.max - qm.min) / 32767,
+        h = 0;
+
+    // zig-zag delta decoding of heights
+    this.data = [];
+    for (var i = 0, l = qm.h.length; i < l; i++) {
+      h += (qm.h[i] >> 1) ^ (-(qm.h[i] & 1));
+      this.data.push(qm.min + h * zScale);
+    }
+    delete this.qm;
+  },
+
   getValue: function (x, y) {
     if (0 <= x && x < this.width && 0 <= y && y < this.height) return this.data[x + this.width * y];
     return null;
@@ -812,6 +899,12 @@ Q3D.MapLayer.prototype = {
         m.m.transparent = (opacity < 1);
         m.m.opacity = opacity;
       }
+      if (m.icons !== undefined) {
+        m.icons.forEach(function (mat) {
+          mat.transparent = (opacity < 1);
+          mat.opacity = opacity;
+        });
+      }
     });
   },
 
@@ -874,9 +967,98 @@ Q3D.DEMLayer.prototype.build = function (parent) {
     }
   }, this);
 
+  if (this.pt) this.initPyramid();
+
   if (parent) parent.add(this.objectGroup);
 };
 
+// DEM pyramid (see lyr.pt). The first block is the root tile. Other tiles are loaded on demand.
+Q3D.DEMLayer.prototype.initPyramid = function () {
+  this._tiles = {"0/0/0": {block: this.blocks[0]}};
+  this.tileBlocks = [];
+  this.blocks[0].obj.geometry.computeBoundingSphere();
+};
+
+// Called from tile files. Tile files have the same format as blocks, so the block is built after its data has been set.
+Q3D.DEMLayer.prototype.addTile = function (level, x, y, params) {
+  var block = new Q3D.DEMBlock(params);
+  this._tiles[level + "/" + x + "/" + y].loaded = block;
+  return block;
+};
+
+Q3D.DEMLayer.prototype.buildTile = function (key) {
+  var tile = this._tiles[key], block = tile.loaded;
+  if (block === undefined) return;
+  delete tile.loaded;
+
+  block.build(this);
+  block.obj.visible = false;
+  block.obj.geometry.computeBoundingSphere();
+  if (this.q) Q3D.application.queryableObjects.push(block.obj);
+  this.tileBlocks.push(block);
+  tile.block = block;
+};
+
+Q3D.DEMLayer.prototype.loadTile = function (level, x, y) {
+  var key = level + "/" + x + "/" + y;
+  if (this._tiles[key] !== undefined) return;
+  this._tiles[key] = {loading: true};
+
+  var e = document.createElement("script");
+  e.src = "./" + this.pt.files[level][x + y * Math.pow(2, level)];
+  e.onload = this.buildTile.bind(this, key);
+  document.body.appendChild(e);
+};
+
+// Select tiles to display by screen-space error (grid interval in pixels)
+Q3D.DEMLayer.prototype.updatePyramid = function (camera, screenHeight) {
+  var tiles = this._tiles,
+      maxLevel = this.pt.levels,
+      maxError = Q3D.Options.dem.maxScreenSpaceError,
+      k = screenHeight / (2 * Math.tan(camera.fov * Math.PI / 360)),
+      center = new THREE.Vector3();
+
+  // show a tile and hide its descendants
+  var showTile = function (level, x, y, visible) {
+    var tile = tiles[level + "/" + x + "/" + y];
+    if (tile === undefined || tile.block === undefined) return;
+    tile.block.obj.visible = visible;
+    if (level < maxLevel) {
+      for (var i = 0; i < 4; i++) showTile(level + 1, x * 2 + i % 2, y * 2 + Math.floor(i / 2), false);
+    }
+  };
+
+  var update = function (level, x, y) {
+    var block = tiles[level + "/" + x + "/" + y].block,
+        sphere = block.obj.geometry.boundingSphere;
+    center.copy(sphere.center).add(block.obj.position);
+
+    var distance = Math.max(camera.position.distanceTo(center) - sphere.radius, 1e-6),
+        error = block.plane.width / (block.width - 1) * k / distance;
+
+    if (level < maxLevel && error > maxError) {
+      // refine when all children have been loaded
+      var children = [], ready = true, tile;
+      for (var i = 0; i < 4; i++) {
+        children.push([level + 1, x * 2 + i % 2, y * 2 + Math.floor(i / 2)]);
+        tile = tiles[children[i].join("/")];
+        if (tile === undefined || tile.block === undefined) {
+          this.loadTile.apply(this, children[i]);
+          ready = false;
+        }
+      }
+      if (ready) {
+        block.obj.visible = false;
+        children.forEach(function (c) { update.apply(this, c); }, this);
+        return;
+      }
+    }
+    showTile(level, x, y, true);
+  }.bind(this);
+
+  update(0, 0, 0);
+};
+
 // Creates sides and bottom of the DEM to give an impression of "extruding" and increase the 3D aspect.
 Q3D.DEMLayer.prototype.buildSides = function (block, color, sole_height) {
   var dem = block;
@@ -1017,8 +1199,14 @@ Q3D.DEMLayer.prototype.getZ = function (x, y) {
   var xmin = -this.project.width / 2,
       ymax = this.project.height / 2;
 
-  for (var i = 0, l = this.blocks.length; i < l; i++) {
-    var block = this.blocks[i];
+  // displayed tiles of DEM pyramid take precedence over the root tile
+  var blocks = this.blocks;
+  if (this.tileBlocks !== undefined) {
+    blocks = this.tileBlocks.filter(function (block) { return block.obj.visible; }).concat(blocks);
+  }
+
+  for (var i = 0, l = blocks.length; i < l; i++) {
+    var block = blocks[i];
     if (!block.contains(x, y)) continue;
 
     var ix = block.plane.width / (block.width - 1),
@@ -1173,7 +1361,7 @@ Q3D.VectorLayer.prototype.buildLabels = function (parent, parentElement, getPoin
     var f = this.f[i];
     f.aElems = [];
     f.aObjs = [];
-    var text = f.a[label.i];
+    var text = this.getAttribute(f, label.i);
     if (text === null || text === "") continue;
 
     var pts = getPointsFunc(f);
@@ -1204,6 +1392,88 @@ Q3D.VectorLayer.prototype.buildLabels = function (parent, parentElement, getPoin
   }
 };
 
+// Restore quantized coordinates of features (see lyr.dq)
+Q3D.VectorLayer.prototype.dequantize = function () {
+  var s = this.dq.s, o = this.dq.o;
+
+  // point is [x, y] or [x, y, z]
+  var dequantizePoints = function (pts) {
+    var pt;
+    for (var i = 0, l = pts.length; i < l; i++) {
+      pt = pts[i];
+      pt[0] = pt[0] * s + o[0];
+      pt[1] = pt[1] * s + o[1];
+      if (pt.length > 2) pt[2] = pt[2] * s + o[2];
+    }
+  };
+
+  var dequantizePolygons = function (polygons) {
+    for (var i = 0, l = polygons.length; i < l; i++) {
+      polygons[i].forEach(dequantizePoints);
+    }
+  };
+
+  this.f.forEach(function (f) {
+    if (f.pts) dequantizePoints(f.pts);
+    if (f.lines) f.lines.forEach(dequantizePoints);
+    if (f.bl) f.bl.forEach(dequantizePoints);
+    if (f.polygons) dequantizePolygons(f.polygons);
+    if (f.triangles) dequantizePoints(f.triangles.v);
+    if (f.centroids) dequantizePoints(f.centroids);
+    if (f.zs) {
+      for (var i = 0, l = f.zs.length; i < l; i++) {
+        f.zs[i] = f.zs[i] * s + o[2];
+      }
+    }
+  });
+  delete this.dq;
+};
+
+// Get an attribute value of a feature. Dictionary-encoded values are decoded with lyr.ad
+Q3D.VectorLayer.prototype.getAttribute = function (f, index) {
+  var v = f.a[index];
+  if (this.ad === undefined || this.ad[index] === undefined) return v;
+  return this.ad[index][v];
+};
+
+// Called from attribute files (see lyr.af)
+Q3D.VectorLayer.prototype.setAttributes = function (start, attrs) {
+  for (var i = 0, l = attrs.length; i < l; i++) {
+    this.f[start + i].a = attrs[i];
+  }
+
+  if (this._attrCallbacks === undefined) return;
+
+  var index = Math.floor(start / this.af.n),
+      callbacks = this._attrCallbacks[index] || [];
+  for (var i = 0, l = callbacks.length; i < l; i++) {
+    callbacks[i]();
+  }
+  delete this._attrCallbacks[index];
+};
+
+// Load the attribute file that has attributes of the feature and call the callback function
+Q3D.VectorLayer.prototype.loadAttributes = function (fid, callback) {
+  if (this.f[fid].a !== undefined || this.af === undefined) {
+    callback();
+    return;
+  }
+
+  if (this._attrCallbacks === undefined) this._attrCallbacks = {};
+
+  var index = Math.floor(fid / this.af.n);
+  if (index in this._attrCallbacks) {
+    // already requested
+    this._attrCallbacks[index].push(callback);
+    return;
+  }
+  this._attrCallbacks[index] = [callback];
+
+  var e = document.createElement("script");
+  e.src = "./" + this.af.files[index];
+  document.body.appendChild(e);
+};
+
 Q3D.VectorLayer.prototype.meshes = function () {
   var meshes = [];
   for (var i = 0, l = this.f.length; i < l; i++) {
@@ -1241,42 +1511,161 @@ Q3D.PointLayer.prototype.build = function (parent) {
   if (this.objType == "Icon") { this.buildIcons(parent); return; }
   if (this.objType == "JSON model") { this.buildJSONModels(parent); return; }
 
-  var materials = this.materials;
-  var deg2rad = Math.PI / 180;
-  var createGeometry, scaleZ = 1;
-  if (this.objType == "Sphere") createGeometry = function (f) { return new THREE.SphereGeometry(f.r); };
-  else if (this.objType == "Cube") createGeometry = function (f) { return new THREE.CubeGeometry(f.w, f.h, f.d); };
-  else if (this.objType == "Disk") {
-    createGeometry = function (f) {
-      var geom = new THREE.CylinderGeometry(f.r, f.r, 0, 32), m = new THREE.Matrix4();
-      if (90 - f.d) geom.applyMatrix(m.makeRotationX((90 - f.d) * deg2rad));
-      if (f.dd) geom.applyMatrix(m.makeRotationZ(-f.dd * deg2rad));
-      return geom;
-    };
-    if (this.ns === undefined || this.ns == false) scaleZ = this.project.zExaggeration;
+  // features are drawn as instances of a unit geometry. instances that have the same material
+  // are merged into a few buffer geometries, so that each group is rendered with a few draw calls.
+  if (this.objType == "Sphere") this.baseGeometry = new THREE.SphereGeometry(1);
+  else if (this.objType == "Disk") this.baseGeometry = new THREE.CylinderGeometry(1, 1, 0, 32);
+  else {
+    if (this.objType == "Cube") this.baseGeometry = new THREE.CubeGeometry(1, 1, 1);
+    else this.baseGeometry = new THREE.CylinderGeometry((this.objType == "Cone") ? 0 : 1, 1, 1);   // Cylinder or Cone
+    this.baseGeometry.applyMatrix(new THREE.Matrix4().makeRotationX(Math.PI / 2));
+    this.zAddend = true;    // bottom of object is at the point
   }
-  else createGeometry = function (f) { return new THREE.CylinderGeometry(f.rt, f.rb, f.h); };   // Cylinder or Cone
+  this.scaleZ = (this.objType == "Disk" && !this.ns) ? this.project.zExaggeration : 1;
 
-  // each feature in this layer
+  // group features by material
+  var groups = {};
   this.f.forEach(function (f, fid) {
     f.objs = [];
-    var z_addend = (f.h) ? f.h / 2 : 0;
-    for (var i = 0, l = f.pts.length; i < l; i++) {
-      var mesh = new THREE.Mesh(createGeometry(f), materials[f.m].m);
-
-      var pt = f.pts[i];
-      mesh.position.set(pt[0], pt[1], pt[2] + z_addend);
-      if (f.rotateX) mesh.rotation.x = f.rotateX * deg2rad;
-      if (scaleZ != 1) mesh.scale.z = scaleZ;
-      mesh.userData.layerId = this.index;
-      mesh.userData.featureId = fid;
+    if (Q3D.Options.exportMode) {
+      // a mesh for each instance, so that exporters can handle them
+      f.objs = this.createFeatureMeshes(fid, this.materials[f.m].m);
+      f.objs.forEach(function (mesh) {
+        this.addObject(mesh);
+      }, this);
+      return;
+    }
+    if (groups[f.m] === undefined) groups[f.m] = [];
+    groups[f.m].push(fid);
+  }, this);
 
+  for (var m in groups) {
+    this.createMergedMeshes(groups[m], this.materials[m].m).forEach(function (mesh) {
       this.addObject(mesh);
-      f.objs.push(mesh);
+    }, this);
+  }
+
+  if (parent) parent.add(this.objectGroup);
+};
+
+// Create meshes of instances of features. a mesh has 65535 vertices at most.
+// userData.featureIds has feature ids of instances in the mesh.
+Q3D.PointLayer.prototype.createMergedMeshes = function (fids, material) {
+  var base = this.getBaseBuffers(),
+      vcount = base.position.length / 3,
+      icount = base.index.length,
+      maxInstances = Math.floor(65535 / vcount);
+
+  // instances to merge
+  var instances = [];
+  fids.forEach(function (fid) {
+    var f = this.f[fid];
+    for (var i = 0, l = f.pts.length; i < l; i++) {
+      instances.push([fid, f, f.pts[i]]);
     }
   }, this);
 
-  if (parent) parent.add(this.objectGroup);
+  var matrix = new THREE.Matrix4(), normalMatrix = new THREE.Matrix3(),
+      v = new THREE.Vector3(), meshes = [];
+
+  for (var start = 0, total = instances.length; start < total; start += maxInstances) {
+    var n = Math.min(maxInstances, total - start),
+        geom = new THREE.BufferGeometry(),
+        position = geom.addAttribute("position", Float32Array, n * vcount, 3).array,
+        normal = geom.addAttribute("normal", Float32Array, n * vcount, 3).array,
+        index = geom.addAttribute("index", Uint16Array, n * icount, 1).array,
+        featureIds = [];
+
+    for (var j = 0; j < n; j++) {
+      var instance = instances[start + j];
+      featureIds.push(instance[0]);
+
+      this.getInstanceMatrix(instance[1], instance[2], matrix);
+      normalMatrix.getNormalMatrix(matrix);
+
+      var o = j * vcount * 3;
+      for (var k = 0, l = vcount * 3; k < l; k += 3) {
+        v.set(base.position[k], base.position[k + 1], base.position[k + 2]).applyMatrix4(matrix);
+        position[o + k] = v.x;
+        position[o + k + 1] = v.y;
+        position[o + k + 2] = v.z;
+
+        v.set(base.normal[k], base.normal[k + 1], base.normal[k + 2]).applyMatrix3(normalMatrix).normalize();
+        normal[o + k] = v.x;
+        normal[o + k + 1] = v.y;
+        normal[o + k + 2] = v.z;
+      }
+
+      o = j * icount;
+      for (var k = 0, vi = j * vcount; k < icount; k++) {
+        index[o + k] = base.index[k] + vi;
+      }
+    }
+    geom.offsets = [{start: 0, index: 0, count: n * icount}];
+    geom.computeBoundingSphere();
+
+    var mesh = new THREE.Mesh(geom, material);
+    mesh.userData.layerId = this.index;
+    mesh.userData.featureIds = featureIds;
+    mesh.userData.vertexCount = vcount;
+    meshes.push(mesh);
+  }
+  return meshes;
+};
+
+// Create a mesh of THREE.Geometry for each instance of a feature (for export mode and highlighting).
+// the meshes share the base geometry.
+Q3D.PointLayer.prototype.createFeatureMeshes = function (fid, material) {
+  var f = this.f[fid], meshes = [];
+  for (var i = 0, l = f.pts.length; i < l; i++) {
+    var mesh = new THREE.Mesh(this.baseGeometry, material);
+    this.getInstanceMatrix(f, f.pts[i], mesh.matrix);
+    mesh.matrixAutoUpdate = false;
+    mesh.matrixWorldNeedsUpdate = true;
+    mesh.userData.layerId = this.index;
+    mesh.userData.featureId = fid;
+    meshes.push(mesh);
+  }
+  return meshes;
+};
+
+// matrix = T * S(1, 1, scaleZ) * Rz * Rx * S
+Q3D.PointLayer.prototype.getInstanceMatrix = function (f, pt, matrix) {
+  var deg2rad = Math.PI / 180, m = new THREE.Matrix4(), v = new THREE.Vector3();
+  matrix.makeTranslation(pt[0], pt[1], (this.zAddend) ? pt[2] + f.s[2] / 2 : pt[2]);
+  if (this.scaleZ != 1) matrix.scale(v.set(1, 1, this.scaleZ));
+  if (f.rot !== undefined) {
+    if (f.rot[1]) matrix.multiply(m.makeRotationZ(f.rot[1] * deg2rad));
+    if (f.rot[0]) matrix.multiply(m.makeRotationX(f.rot[0] * deg2rad));
+  }
+  matrix.scale(v.set(f.s[0], f.s[1], f.s[2]));
+  return matrix;
+};
+
+// Vertex positions, normals and indices of the base geometry.
+// vertices are not shared between faces with different normals.
+Q3D.PointLayer.prototype.getBaseBuffers = function () {
+  if (this._baseBuffers) return this._baseBuffers;
+
+  var geom = this.baseGeometry,
+      position = [], normal = [], index = [], vmap = {};
+  geom.computeFaceNormals();
+  geom.faces.forEach(function (face) {
+    var vi = [face.a, face.b, face.c];
+    for (var i = 0; i < 3; i++) {
+      var n = (face.vertexNormals.length == 3) ? face.vertexNormals[i] : face.normal,
+          key = [vi[i], n.x, n.y, n.z].join(",");
+      if (vmap[key] === undefined) {
+        var pt = geom.vertices[vi[i]];
+        vmap[key] = position.length / 3;
+        position.push(pt.x, pt.y, pt.z);
+        normal.push(n.x, n.y, n.z);
+      }
+      index.push(vmap[key]);
+    }
+  });
+  this._baseBuffers = {position: position, normal: normal, index: index};
+  return this._baseBuffers;
 };
 
 Q3D.PointLayer.prototype.buildIcons = function (parent) {
@@ -1284,16 +1673,31 @@ Q3D.PointLayer.prototype.buildIcons = function (parent) {
   this.f.forEach(function (f, fid) {
     var mat = this.materials[f.m];
     var image = this.project.images[mat.i];
+    var material = mat.m, width = image.width, height = image.height;
+
+    if (mat.r !== undefined) {
+      // icon is a part of atlas image. materials of icons share the texture of atlas
+      var rect = mat.r[f.icon];
+      if (mat.icons === undefined) mat.icons = [];
+      if (mat.icons[f.icon] === undefined) {
+        mat.icons[f.icon] = mat.m.clone();
+        mat.icons[f.icon].map = Q3D.Utils.subTexture(mat.m.map, rect[0] / width, 1 - (rect[1] + rect[3]) / height,
+                                                                rect[2] / width, rect[3] / height);
+      }
+      material = mat.icons[f.icon];
+      width = rect[2];
+      height = rect[3];
+    }
 
     // base size is 64 x 64
     var scale = (f.scale === undefined) ? 1 : f.scale;
-    var sx = image.width / 64 * scale,
-        sy = image.height / 64 * scale;
+    var sx = width / 64 * scale,
+        sy = height / 64 * scale;
 
     f.objs = [];
     for (var i = 0, l = f.pts.length; i < l; i++) {
       var pt = f.pts[i];
-      var sprite = new THREE.Sprite(mat.m);
+      var sprite = new THREE.Sprite(material);
       sprite.position.set(pt[0], pt[1], pt[2]);
       sprite.scale.set(sx, sy, scale);
       sprite.userData.layerId = this.index;
@@ -1429,15 +1833,6 @@ Q3D.PolygonLayer.prototype = Object.create(Q3D.VectorLayer.prototype);
 Q3D.PolygonLayer.prototype.build = function (parent) {
   var materials = this.materials;
 
-  var arrayToVec2Array = function (points) {
-    var pt, pts = [];
-    for (var i = 0, l = points.length; i < l; i++) {
-      pt = points[i];
-      pts.push(new THREE.Vector2(pt[0], pt[1]));
-    }
-    return pts;
-  };
-
   var arrayToVec3Array = function (points, zFunc) {
     if (zFunc === undefined) zFunc = function () { return 0; };
     var pt, pts = [];
@@ -1458,12 +1853,48 @@ Q3D.PolygonLayer.prototype.build = function (parent) {
   };
 
   if (this.objType == "Extruded") {
-    var createObject = function (f, polygon, z) {
-      var shape = new THREE.Shape(arrayToVec2Array(polygon[0]));
-      for (var i = 1, l = polygon.length; i < l; i++) {
-        shape.holes.push(new THREE.Path(arrayToVec2Array(polygon[i])));
+    // polygon has been triangulated in exporter. faces is a flat list of vertex indices
+    // of counter-clockwise triangles. outer boundary is clockwise and holes are counter-clockwise
+    var createObject = function (f, polygon, faces, z) {
+      var geom = new THREE.Geometry(),
+          vertices = geom.vertices,
+          bnd, pt, i, j, l, m, n, start;
+
+      // bottom vertices (boundary points except closing points)
+      for (i = 0, l = polygon.length; i < l; i++) {
+        bnd = polygon[i];
+        for (j = 0, m = bnd.length - 1; j < m; j++) {
+          pt = bnd[j];
+          vertices.push(new THREE.Vector3(pt[0], pt[1], 0));
+        }
       }
-      var geom = new THREE.ExtrudeGeometry(shape, {bevelEnabled: false, amount: f.h});
+
+      // top vertices
+      n = vertices.length;
+      for (i = 0; i < n; i++) {
+        vertices.push(new THREE.Vector3(vertices[i].x, vertices[i].y, f.h));
+      }
+
+      // top and bottom faces
+      for (i = 0, l = faces.length; i < l; i += 3) {
+        geom.faces.push(new THREE.Face3(faces[i] + n, faces[i + 1] + n, faces[i + 2] + n));
+        geom.faces.push(new THREE.Face3(faces[i], faces[i + 2], faces[i + 1]));
+      }
+
+      // side faces
+      start = 0;
+      for (i = 0, l = polygon.length; i < l; i++) {
+        m = polygon[i].length - 1;
+        for (j = 0; j < m; j++) {
+          var v0 = start + j,
+              v1 = start + (j + 1) % m;
+          geom.faces.push(new THREE.Face3(v0, v0 + n, v1 + n));
+          geom.faces.push(new THREE.Face3(v0, v1 + n, v1));
+        }
+        start += m;
+      }
+      geom.computeFaceNormals();
+
       var mesh = new THREE.Mesh(geom, materials[f.m].m);
       mesh.position.z = z;
       return mesh;
@@ -1474,7 +1905,7 @@ Q3D.PolygonLayer.prototype.build = function (parent) {
       f.objs = [];
       var userData = {layerId: this.index, featureId: fid};
       for (var i = 0, l = f.polygons.length; i < l; i++) {
-        var obj = createObject(f, f.polygons[i], f.zs[i]);
+        var obj = createObject(f, f.polygons[i], f.faces[i], f.zs[i]);
         obj.userData = userData;
         this.addObject(obj);
         f.objs.push(obj);
@@ -1486,47 +1917,15 @@ Q3D.PolygonLayer.prototype.build = function (parent) {
     if (relativeToDEM) {
       var dem = this.project.layers[0];
     }
-    var face012 = new THREE.Face3(0, 1, 2);
     var createObject = function (f) {
       var zFunc;
       if (relativeToDEM) zFunc = function (x, y) { return dem.getZ(x, y) + f.h; };
       else zFunc = function (x, y) { return f.h; };
 
+      // polygons (split by DEM triangles in relative altitude mode) have been triangulated in exporter
       var geom = new THREE.Geometry();
-
-      // vertices and faces
-      if (f.triangles !== undefined) {
-        geom.vertices = arrayToVec3Array(f.triangles.v, zFunc);
-        geom.faces = arrayToFace3Array(f.triangles.f);
-      }
-
-      // polygons (number of vertices > 3)
-      var polygons = (relativeToDEM) ? (f.split_polygons || []) : f.polygons;
-      for (var i = 0, l = polygons.length; i < l; i++) {
-        var polygon = polygons[i];
-        var triangles = new THREE.Geometry(),
-            holes = [];
-
-        // make Vector3 arrays
-        triangles.vertices = arrayToVec3Array(polygon[0], zFunc);
-        for (var j = 1, m = polygon.length; j < m; j++) {
-          holes.push(arrayToVec3Array(polygon[j], zFunc));
-        }
-
-        // triangulate polygon
-        var faces = THREE.Shape.Utils.triangulateShape(triangles.vertices, holes);
-
-        // append points of holes to vertices
-        for (var j = 0, m = holes.length; j < m; j++) {
-          Array.prototype.push.apply(triangles.vertices, holes[j]);
-        }
-
-        // element of faces is [index1, index2, index3]
-        triangles.faces = arrayToFace3Array(faces);
-
-        THREE.GeometryUtils.merge(geom, triangles, 0);
-      }
-      geom.mergeVertices();
+      geom.vertices = arrayToVec3Array(f.triangles.v, zFunc);
+      geom.faces = arrayToFace3Array(f.triangles.f);
       geom.computeFaceNormals();
       geom.computeVertexNormals();
       var mesh = new THREE.Mesh(geom, materials[f.m].m);
@@ -1534,6 +1933,16 @@ Q3D.PolygonLayer.prototype.build = function (parent) {
       if (f.b === undefined) return mesh;
 
       // border
+      if (f.bl !== undefined) {
+        // borders have been draped on DEM surface in exporter
+        for (var i = 0, l = f.bl.length; i < l; i++) {
+          var geom = new THREE.Geometry();
+          geom.vertices = f.bl[i].map(function (pt) { return new THREE.Vector3(pt[0], pt[1], pt[2]); });
+          mesh.add(new THREE.Line(geom, materials[f.b].m));
+        }
+        return mesh;
+      }
+
       for (var i = 0, l = f.polygons.length; i < l; i++) {
         var polygon = f.polygons[i];
         for (var j = 0, m = polygon.length; j < m; j++) {
@@ -1678,6 +2087,21 @@ Q3D.Utils.loadTextureData = function (imageData) {
   return texture;
 };
 
+// Create a texture that refers to a part of given texture. the texture object of WebGL is
+// shared with the original texture, so the image is uploaded to GPU only once.
+Q3D.Utils.subTexture = function (texture, offsetX, offsetY, repeatX, repeatY) {
+  var sub = Object.create(texture);
+  ["_needsUpdate", "__webglInit", "__webglTexture"].forEach(function (name) {
+    Object.defineProperty(sub, name, {
+      get: function () { return texture[name]; },
+      set: function (value) { texture[name] = value; }
+    });
+  });
+  sub.offset = new THREE.Vector2(offsetX, offsetY);
+  sub.repeat = new THREE.Vector2(repeatX, repeatY);
+  return sub;
+};
+
 // Put a stick to given position (for debug)
 Q3D.Utils.putStick = function (x, y, zFunc, h) {
   if (Q3D.Utils._stick_mat === undefined) Q3D.Utils._stick_mat = new THREE.LineBasicMaterial({color: 0xff0000});
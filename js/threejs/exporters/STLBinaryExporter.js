@@ -20,6 +20,7 @@ THREE.STLBinaryExporter.prototype = {
 			var triangles = 0;
 			scene.traverse( function ( object ) {
 				if ( !(object instanceof THREE.Mesh) ) return;
+				if ( !(object.geometry instanceof THREE.Geometry )) return;
 				triangles += object.geometry.faces.length;
 			});
 
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ Qgis2threejs
+                                 A QGIS plugin
+ export terrain data, map canvas image and vector data to web browser
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 Qgis2threejs contributors
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import re
+from itertools import chain
+
+_hexmatch = re.compile("0x[0-9A-Fa-f]+$").match
+
+
+class JSEncoder:
+  """encode python objects into javascript literals
+
+  escape: escape backslashes and double quotes in strings
+  quoteHex: if False, hex literal strings (e.g. "0xff0000") are written without quotes
+  null: object to be written as null in addition to None (e.g. qgis.core.NULL)
+  """
+
+  def __init__(self, escape=False, quoteHex=True, null=None):
+    self.escape = escape
+    self.quoteHex = quoteHex
+    self.null = null
+    self._encode = self._makeEncoder()
+
+  def encode(self, obj):
+    """return javascript literal of the object"""
+    chunks = []
+    self._encode(obj, chunks.append)
+    return u"".join(chunks)
+
+  def encodeTo(self, obj, write):
+    """pass fragments of javascript literal of the object to write function"""
+    self._encode(obj, write)
+
+  def _makeEncoder(self):
+    # bind everything to local variables of closures. this encoder is called
+    # for every feature, block and attribute row, so attribute lookups matter.
+    escape, quoteHex, null = self.escape, self.quoteHex, self.null
+    dict_, list_, tuple_, float_, int_, long_, bool_, str_, unicode_ = dict, list, tuple, float, int, long, bool, str, unicode
+    hexmatch = _hexmatch
+
+    floatfmt = "%.12g"    # same number of significant digits as str(value)
+    floatstr = lambda v: floatfmt % v
+    floattype, inttype, listtype = set([float_]), set([int_]), set([list_])
+
+    def numberFormat(types):
+      # format of a number in lists that consist of numbers of one type
+      if types == floattype:
+        return floatfmt
+      if types == inttype:
+        return "%d"
+      return None
+
+    def encodeStr(s):
+      if escape:
+        if '"' in s or "\\" in s:
+          return u'"' + s.replace("\\", "\\\\").replace('"', '\\"') + u'"'
+        return u'"' + s + u'"'
+      if not quoteHex and s[:2] == "0x" and hexmatch(s):
+        return s
+      return u'"' + s + u'"'
+
+    nulltype = type(null)
+
+    def encodeOther(obj, append):
+      if obj is None or type(obj) is nulltype or (null is not None and obj == null):
+        append("null")
+      elif isinstance(obj, dict_):
+        encodeDict(obj, append)
+      elif isinstance(obj, (list_, tuple_)):
+        encodeList(obj, append)
+      elif isinstance(obj, bool_):
+        append("true" if obj else "false")
+      elif isinstance(obj, (str_, unicode_)):
+        append(encodeStr(obj))
+      elif isinstance(obj, (int_, long_)):
+        append(str_(obj))
+      elif isinstance(obj, float_):
+        append(floatstr(obj))
+      else:
+        append(u'"' + unicode_(obj) + u'"')
+
+    def encodeList(obj, append):
+      if not obj:
+        append("[]")
+        return
+
+      # fast paths for lists of numbers (e.g. grid values and indices) and lists of
+      # points. all numbers are formatted with a single string formatting operation.
+      t = type(obj[0])
+      if t is float_ or t is int_:
+        fmt = numberFormat(set(map(type, obj)))
+        if fmt:
+          append(("[" + ",".join([fmt] * len(obj)) + "]") % tuple(obj))
+          return
+      elif t is list_ and set(map(type, obj)) == listtype:
+        lens = set(map(len, obj))
+        if len(lens) == 1:
+          values = tuple(chain.from_iterable(obj))
+          fmt = numberFormat(set(map(type, values)))
+          if fmt:
+            row = "[" + ",".join([fmt] * lens.pop()) + "]"
+            append(("[" + ",".join([row] * len(obj)) + "]") % values)
+            return
+
+      parts = []
+      for v in obj:
+        t = type(v)
+        if t is float_:
+          parts.append(floatfmt % v)
+        elif t is int_:
+          parts.append(str_(v))
+        elif t is unicode_ or t is str_:
+          parts.append(encodeStr(v))
+        else:
+          chunks = []
+          if t is list_:
+            encodeList(v, chunks.append)
+          elif t is dict_:
+            encodeDict(v, chunks.append)
+          else:
+            encodeOther(v, chunks.append)
+          parts.append(u"".join(chunks))
+      append(u"[" + u",".join(parts) + u"]")
+
+    def encodeDict(obj, append):
+      sep = "{"
+      for k, v in obj.iteritems():
+        append(sep + unicode_(k) + ":")
+        sep = ","
+        t = type(v)
+        if t is float_:
+          append(floatstr(v))
+        elif t is list_:
+          encodeList(v, append)
+        elif t is int_:
+          append(str_(v))
+        elif t is unicode_ or t is str_:
+          append(encodeStr(v))
+        elif t is dict_:
+          encodeDict(v, append)
+        else:
+          encodeOther(v, append)
+      append("}" if sep == "," else "{}")
+
+    def encode(obj, append):
+      t = type(obj)
+      if t is dict_:
+        encodeDict(obj, append)
+      elif t is list_:
+        encodeList(obj, append)
+      else:
+        encodeOther(obj, append)
+
+    return encode
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ Qgis2threejs
+                                 A QGIS plugin
+ export terrain data, map canvas image and vector data to web browser
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 Qgis2threejs contributors
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+# Writers of 3D model files (binary STL and Wavefront OBJ).
+# Triangles are written to the file as meshes are added, so memory usage does not grow with model size.
+import math
+import struct
+
+from earcut import triangulate
+
+# same as Q3D.Options.sole_height of the viewer
+SOLE_HEIGHT = 1.5
+
+
+class MeshWriter:
+  """ base class of model file writers. coordinates are the same as those of the viewer (z-up).
+      f is a file-like object opened in binary mode, which is closed by close(). """
+
+  def __init__(self, f):
+    self.file = f
+    self.triangleCount = 0
+
+  def addMesh(self, vertices, triangles):
+    """ vertices: list of (x, y, z). triangles: iterable of counter-clockwise vertex index triples """
+    pass
+
+  def close(self):
+    pass
+
+  def addGrid(self, width, height, values, planeWidth, planeHeight, offsetX=0, offsetY=0, sides=False):
+    """ add a DEM grid. values are in row-major order from north-west corner.
+        if sides is True, sides and bottom are added to make a closed solid. """
+    xs = [offsetX - planeWidth / 2.0 + planeWidth * x / (width - 1) for x in range(width)]
+    ys = [offsetY + planeHeight / 2.0 - planeHeight * y / (height - 1) for y in range(height)]
+    vertices = [(xs[i % width], ys[i // width], values[i]) for i in range(width * height)]
+
+    def gridTriangles():
+      # same triangles as THREE.PlaneGeometry
+      for y in range(height - 1):
+        for x in range(width - 1):
+          a = x + width * y
+          b = a + width
+          yield (a, b, a + 1)
+          yield (b, b + 1, a + 1)
+
+    self.addMesh(vertices, gridTriangles())
+    if not sides:
+      return
+
+    # boundary of grid in counter-clockwise order from south-west corner
+    ring = [x + width * (height - 1) for x in range(width - 1)]
+    ring += [width - 1 + width * y for y in range(height - 1, 0, -1)]
+    ring += [x for x in range(width - 1, 0, -1)]
+    ring += [width * y for y in range(height - 1)]
+
+    n = len(ring)
+    bottom = -SOLE_HEIGHT
+    vertices = [vertices[i] for i in ring] + [(v[0], v[1], bottom) for v in (vertices[i] for i in ring)]
+    vertices.append((offsetX, offsetY, bottom))   # center of bottom
+
+    def sideAndBottomTriangles():
+      for i in range(n):
+        j = (i + 1) % n
+        yield (n + i, n + j, j)
+        yield (n + i, j, i)
+        yield (2 * n, n + j, n + i)
+
+    self.addMesh(vertices, sideAndBottomTriangles())
+
+  def addExtrudedPolygon(self, polygon, z, height, faces=None):
+    """ add an extruded polygon. polygon is a list of closed rings of (x, y) (outer ring clockwise
+        and holes counter-clockwise). faces is a flat list of counter-clockwise triangle indices. """
+    rings = [ring[:-1] for ring in polygon]
+    if faces is None:
+      faces = triangulate(polygon)[1]
+
+    bottom = [(pt[0], pt[1], z) for ring in rings for pt in ring]
+    top = [(pt[0], pt[1], z + height) for ring in rings for pt in ring]
+    n = len(bottom)
+
+    def triangles():
+      for i in range(0, len(faces), 3):
+        yield (faces[i] + n, faces[i + 1] + n, faces[i + 2] + n)
+        yield (faces[i], faces[i + 2], faces[i + 1])
+
+      start = 0
+      for ring in rings:
+        m = len(ring)
+        for i in range(m):
+          v0 = start + i
+          v1 = start + (i + 1) % m
+          yield (v0, v0 + n, v1 + n)
+          yield (v0, v1 + n, v1)
+        start += m
+
+    self.addMesh(bottom + top, triangles())
+
+
+class STLWriter(MeshWriter):
+  """ binary STL writer. number of triangles in the header is written when the file is closed. """
+
+  def __init__(self, f):
+    MeshWriter.__init__(self, f)
+    self.file.write(struct.pack("<80sI", "Qgis2threejs binary STL", 0))
+    self.pack = struct.Struct("<12fH").pack
+
+  def addMesh(self, vertices, triangles):
+    write, pack = self.file.write, self.pack
+    count = 0
+    for a, b, c in triangles:
+      v0, v1, v2 = vertices[a], vertices[b], vertices[c]
+      ux, uy, uz = v1[0] - v0[0], v1[1] - v0[1], v1[2] - v0[2]
+      vx, vy, vz = v2[0] - v0[0], v2[1] - v0[1], v2[2] - v0[2]
+      nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+      d = math.sqrt(nx * nx + ny * ny + nz * nz)
+      if d:
+        nx, ny, nz = nx / d, ny / d, nz / d
+      write(pack(nx, ny, nz, v0[0], v0[1], v0[2], v1[0], v1[1], v1[2], v2[0], v2[1], v2[2], 0))
+      count += 1
+    self.triangleCount += count
+
+  def close(self):
+    # patch number of triangles
+    self.file.seek(80)
+    self.file.write(struct.pack("<I", self.triangleCount))
+    self.file.close()
+
+
+class OBJWriter(MeshWriter):
+  """ Wavefront OBJ writer. each mesh is written as an object """
+
+  def __init__(self, f):
+    MeshWriter.__init__(self, f)
+    self.file.write("# Qgis2threejs\n")
+    self.vertexCount = 0
+    self.meshCount = 0
+
+  def addMesh(self, vertices, triangles):
+    write = self.file.write
+    self.meshCount += 1
+    write("o mesh%d\n" % self.meshCount)
+    for v in vertices:
+      write("v %.6f %.6f %.6f\n" % v)
+
+    o = self.vertexCount + 1    # vertex index is 1-based
+    count = 0
+    for a, b, c in triangles:
+      write("f %d %d %d\n" % (a + o, b + o, c + o))
+      count += 1
+    self.vertexCount += len(vertices)
+    self.triangleCount += count
+
+  def close(self):
+    self.file.close()
@@ -48,6 +48,8 @@ def setupWidgets(ppage, mapTo3d, layer, type_index=0):
     ppage.addStyleWidget(StyleWidget.FIELD_VALUE, {"name": "Dip direction", "label": "Degrees", "defaultValue": 0, "label_field": None, "layer": layer})
 
 def write(writer, layer, feat):
+  # every feature is an instance of a unit geometry of the object type. s is scale of the instance
+  # in x, y and z directions and rot is rotation around x and z axes in degrees (Disk only).
   mat = layer.materialManager.getMeshLambertIndex(feat.color(), feat.transparency())
   mapTo3d = writer.context.mapTo3d
   vals = feat.propValues()
@@ -55,21 +57,20 @@ def write(writer, layer, feat):
   if feat.prop.type_index == 0:  # Sphere
     r = float(vals[0]) * mapTo3d.multiplier
     if r:
-      writer.writeFeature({"m": mat, "pts": pts,"r": r})
+      writer.writeFeature({"m": mat, "pts": pts, "s": [r, r, r]})
     else:
       QgsMessageLog.logMessage(u"Sphere with zero radius not exported", "Qgis2threejs")
   elif feat.prop.type_index in [1, 3]: # Cylinder, Cone
-    rb = float(vals[0]) * mapTo3d.multiplier
-    rt = 0 if feat.prop.type_index == 3 else rb
+    r = float(vals[0]) * mapTo3d.multiplier
     h = float(vals[1]) * mapTo3d.multiplierZ
-    writer.writeFeature({"m": mat, "pts": pts, "rt": rt, "rb": rb, "h": h, "rotateX": 90})
+    writer.writeFeature({"m": mat, "pts": pts, "s": [r, r, h]})
   elif feat.prop.type_index == 2:  # Cube
     w = float(vals[0]) * mapTo3d.multiplier
     d = float(vals[1]) * mapTo3d.multiplier
     h = float(vals[2]) * mapTo3d.multiplierZ
-    writer.writeFeature({"m": mat, "pts": pts, "w": w, "d": d, "h": h, "rotateX": 90})
+    writer.writeFeature({"m": mat, "pts": pts, "s": [w, d, h]})
   elif feat.prop.type_index == 4:  # Disk
     r = float(vals[0]) * mapTo3d.multiplier
     d = float(vals[1])
     dd = float(vals[2])
-    writer.writeFeature({"m": mat, "pts": pts, "r": r, "d": d, "dd": dd})
+    writer.writeFeature({"m": mat, "pts": pts, "s": [r, 1, r], "rot": [90 - d, -dd]})
@@ -39,5 +39,5 @@ def write(writer, layer, feat):
   vals = feat.propValues()
   image_path = vals[0]
   scale = float(vals[1])
-  mat = layer.materialManager.getSpriteIndex(image_path, feat.transparency())
-  writer.writeFeature({"m": mat, "pts": feat.geom.asList(), "scale": scale})
+  mat, icon = layer.materialManager.getSpriteAtlasIndex(image_path, feat.transparency())
+  writer.writeFeature({"m": mat, "icon": icon, "pts": feat.geom.asList(), "scale": scale})
@@ -21,6 +21,7 @@
 """
 from qgis.core import QGis
 from Qgis2threejs.stylewidget import StyleWidget, HeightWidgetFunc, LabelHeightWidgetFunc
+from Qgis2threejs.earcut import triangulate
 
 def geometryType():
   return QGis.Polygon
@@ -60,23 +61,29 @@ class Triangles:
     self.vdict = {}   # dict to find whether a vertex already exists: [y][x] = vertex index
 
   def addTriangle(self, v1, v2, v3):
-    vi1 = self._vertexIndex(v1)
-    vi2 = self._vertexIndex(v2)
-    vi3 = self._vertexIndex(v3)
+    vi1 = self._vertexIndex(v1[0], v1[1])
+    vi2 = self._vertexIndex(v2[0], v2[1])
+    vi3 = self._vertexIndex(v3[0], v3[1])
     self.faces.append([vi1, vi2, vi3])
 
-  def _vertexIndex(self, v):
-    x_dict = self.vdict.get(v.y)
+  def addPolygon(self, polygon):
+    vertices, indices = triangulate(polygon)
+    vi = [self._vertexIndex(x, y) for x, y in vertices]
+    for i in range(0, len(indices), 3):
+      self.faces.append([vi[indices[i]], vi[indices[i + 1]], vi[indices[i + 2]]])
+
+  def _vertexIndex(self, x, y):
+    x_dict = self.vdict.get(y)
     if x_dict:
-      vi = x_dict.get(v.x)
+      vi = x_dict.get(x)
       if vi is not None:
         return vi
     vi = len(self.vertices)
-    self.vertices.append(v)
+    self.vertices.append([x, y])
     if x_dict:
-      x_dict[v.x] = vi
+      x_dict[x] = vi
     else:
-      self.vdict[v.y] = {v.x: vi}
+      self.vdict[y] = {x: vi}
     return vi
 
 
@@ -84,15 +91,15 @@ def write(writer, layer, feat):
   vals = feat.propValues()
   polygons = []
   zs = []
-  for polygon in feat.geom.polygons:
+  for polygon in feat.geom.asList():
     bnds = []
     zsum = zcount = 0
     for boundary in polygon:
-      bnds.append(map(lambda pt: [pt.x, pt.y], boundary))
-      zsum += sum(map(lambda pt: pt.z, boundary), -boundary[0].z)
+      bnds.append([pt[:2] for pt in boundary])
+      zsum += sum([pt[2] for pt in boundary[1:]])
       zcount += len(boundary) - 1
     polygons.append(bnds)
-    zs.append(zsum / zcount)
+    zs.append(float(zsum) / zcount)
 
   d = {"polygons": polygons}
 
@@ -101,6 +108,10 @@ def write(writer, layer, feat):
     d["zs"] = zs
     d["h"] = float(vals[0]) * writer.context.mapTo3d.multiplierZ
 
+    # triangles of top and bottom faces. vertex index is index of point in the polygon
+    # except closing points of boundaries
+    d["faces"] = [triangulate(bnds)[1] for bnds in polygons]
+
   else:   # Overlay
     d["m"] = layer.materialManager.getMeshLambertIndex(feat.color(), feat.transparency(), True)
     if vals[0] is not None:
@@ -108,23 +119,25 @@ def write(writer, layer, feat):
 
     d["h"] = feat.relativeHeight() * writer.context.mapTo3d.multiplierZ
 
-    polygons = []
     triangles = Triangles()
-    for polygon in feat.geom.split_polygons:
-      boundary = polygon[0]
-      if len(polygon) == 1 and len(boundary) == 4:
-        triangles.addTriangle(boundary[0], boundary[2], boundary[1])    # vertex order should be counter-clockwise
-      else:
-        bnds = [map(lambda pt: [pt.x, pt.y], bnd) for bnd in polygon]
-        polygons.append(bnds)
+    if feat.prop.isHeightRelativeToDEM():
+      for polygon in feat.geom.split_polygons.asList():
+        boundary = polygon[0]
+        if len(polygon) == 1 and len(boundary) == 4:
+          triangles.addTriangle(boundary[0], boundary[2], boundary[1])    # vertex order should be counter-clockwise
+        else:
+          triangles.addPolygon(polygon)
+    else:
+      for polygon in feat.geom.asList():
+        triangles.addPolygon(polygon)
 
-    if triangles.vertices:
-      d["triangles"] = {"v": map(lambda pt: [pt.x, pt.y], triangles.vertices), "f": triangles.faces}
+    d["triangles"] = {"v": triangles.vertices, "f": triangles.faces}
 
-    if polygons:
-      d["split_polygons"] = polygons
+    # borders draped on the DEM surface
+    if "b" in d and feat.geom.borders is not None:
+      d["bl"] = feat.geom.borders.asList()
 
   if feat.geom.centroids:
-    d["centroids"] = map(lambda pt: [pt.x, pt.y, pt.z], feat.geom.centroids)
+    d["centroids"] = feat.geom.centroidList()
 
   writer.writeFeature(d)
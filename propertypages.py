@@ -156,8 +156,9 @@ class WorldPropertyPage(PropertyPage, Ui_WorldPropertiesWidget):
     PropertyPage.__init__(self, PAGE_WORLD, dialog, parent)
     Ui_WorldPropertiesWidget.setupUi(self, self)
 
-    self.registerPropertyWidgets([self.lineEdit_zFactor, self.lineEdit_zShift, self.radioButton_Color, self.lineEdit_Color, self.radioButton_WGS84])
+    self.registerPropertyWidgets([self.lineEdit_zFactor, self.lineEdit_zShift, self.radioButton_Color, self.lineEdit_Color, self.radioButton_WGS84, self.spinBox_MaxFileSize, self.checkBox_Quantize, self.spinBox_QuantizeBits, self.checkBox_ZipBundle, self.checkBox_HashNames, self.checkBox_STL, self.checkBox_OBJ])
     self.radioButton_Color.toggled.connect(self.backgroundToggled)
+    self.checkBox_Quantize.toggled.connect(self.spinBox_QuantizeBits.setEnabled)
     self.toolButton_Color.clicked.connect(self.colorButtonClicked)
 
   def setup(self, properties=None):
@@ -268,7 +269,7 @@ class DEMPropertyPage(PropertyPage, Ui_DEMPropertiesWidget):
     widgets = [self.comboBox_DEMLayer, self.spinBox_demtransp]
     widgets += [self.radioButton_Simple, self.horizontalSlider_Resolution]
     widgets += [self.checkBox_Surroundings, self.spinBox_Size, self.spinBox_Roughening]
-    widgets += [self.radioButton_Advanced, self.spinBox_Height, self.lineEdit_xmin, self.lineEdit_ymin, self.lineEdit_xmax, self.lineEdit_ymax]
+    widgets += [self.radioButton_Advanced, self.spinBox_Height, self.lineEdit_xmin, self.lineEdit_ymin, self.lineEdit_xmax, self.lineEdit_ymax, self.checkBox_QuantizedMesh, self.checkBox_Pyramid, self.spinBox_PyramidLevels, self.checkBox_TextureAtlas]
     widgets += dispTypeButtons
     widgets += [self.checkBox_TransparentBackground, self.comboBox_ImageLayer, self.lineEdit_ImageFile, self.lineEdit_Color]
     widgets += [self.checkBox_Shading, self.checkBox_Sides, self.checkBox_Frame]
@@ -507,7 +508,7 @@ class DEMPropertyPage(PropertyPage, Ui_DEMPropertiesWidget):
     if self.isPrimary:
       self.setWidgetsVisible([self.groupBox_Accessories], isSimpleMode)
       self.setLayoutsVisible([self.horizontalLayout_Advanced1, self.horizontalLayout_Advanced3], isAdvancedMode)
-      self.setWidgetsVisible([self.label_Focus], isAdvancedMode)
+      self.setWidgetsVisible([self.label_Focus, self.checkBox_QuantizedMesh, self.checkBox_Pyramid, self.label_PyramidLevels, self.spinBox_PyramidLevels, self.checkBox_TextureAtlas], isAdvancedMode)
       if isSimpleMode:
         self.setLayoutVisible(self.horizontalLayout_Advanced4, False)
       else:
@@ -570,13 +571,15 @@ class VectorPropertyPage(PropertyPage, Ui_VectorPropertiesWidget):
       # assign the widget to property page attribute
       setattr(self, objName, widget)
 
-    widgets = [self.comboBox_ObjectType, self.heightWidget, self.colorWidget, self.transparencyWidget] + self.styleWidgets
+    widgets = [self.comboBox_ObjectType, self.heightWidget, self.checkBox_Drape, self.colorWidget, self.transparencyWidget] + self.styleWidgets
     widgets += [self.radioButton_AllFeatures, self.radioButton_IntersectingFeatures, self.checkBox_Clip]
-    widgets += [self.checkBox_ExportAttrs, self.comboBox_Label, self.labelHeightWidget]
+    widgets += [self.checkBox_Simplify, self.lineEdit_SimplifyTolerance]
+    widgets += [self.checkBox_ExportAttrs, self.checkBox_AttrsOnDemand, self.comboBox_Label, self.labelHeightWidget]
     self.registerPropertyWidgets(widgets)
 
     self.comboBox_ObjectType.currentIndexChanged.connect(self.setupStyleWidgets)
     self.checkBox_ExportAttrs.toggled.connect(self.exportAttrsToggled)
+    self.checkBox_Simplify.toggled.connect(self.lineEdit_SimplifyTolerance.setEnabled)
     for radioButton in [self.radioButton_AllFeatures, self.radioButton_IntersectingFeatures]:
       radioButton.toggled.connect(self.featuresToExportChanged)
 
@@ -621,6 +624,12 @@ class VectorPropertyPage(PropertyPage, Ui_VectorPropertiesWidget):
     # point layer has no geometry clip option
     self.checkBox_Clip.setVisible(layer.geometryType() != QGis.Point)
 
+    # lines and polygon borders can be draped on DEM surface
+    self.checkBox_Drape.setVisible(layer.geometryType() != QGis.Point)
+
+    # point layer has no simplification option
+    self.setLayoutVisible(self.horizontalLayout_Simplify, layer.geometryType() != QGis.Point)
+
     # set up style widgets for selected object type
     self.setupStyleWidgets()
 
@@ -659,6 +668,7 @@ class VectorPropertyPage(PropertyPage, Ui_VectorPropertiesWidget):
     self.setEnabled(item.data(0, Qt.CheckStateRole) == Qt.Checked)
 
   def exportAttrsToggled(self, checked):
+    self.checkBox_AttrsOnDemand.setEnabled(checked)
     self.setLayoutEnabled(self.formLayout_Label, checked)
     self.labelHeightWidget.setEnabled(checked)
 
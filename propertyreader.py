@@ -160,6 +160,46 @@ class VectorPropertyReader:
     #  return float(f.attributes()[lst[0] - HeightWidgetFunc.FIRST_ATTR_REL]) + float(lst[2])
     #return float(f.attributes()[lst[0] - HeightWidgetFunc.FIRST_ATTR_ABS]) + float(lst[2])
 
+  # names of fields needed to read values from height and style widgets
+  def usedFieldNames(self):
+    names = set()
+    useRenderer = False
+
+    vals = self.properties["heightWidget"]
+    if vals["comboData"] >= HeightWidgetFunc.FIRST_ATTR_ABS:
+      names.add(vals["comboText"].lstrip("+").strip(' "'))
+
+    widgetValues = self.properties["colorWidget"]
+    if widgetValues["comboData"] == ColorWidgetFunc.FEATURE:
+      useRenderer = True
+
+    widgetValues = self.properties["transparencyWidget"]
+    if widgetValues["comboData"] not in [TransparencyWidgetFunc.VALUE, TransparencyWidgetFunc.LAYER]:
+      useRenderer = True
+
+    for i in range(32):   # big number for style count
+      widgetValues = self.properties.get("styleWidget" + str(i))
+      if not widgetValues:
+        break
+
+      widgetType = widgetValues["type"]
+      if widgetType in [StyleWidget.COLOR, StyleWidget.BORDER_COLOR]:
+        if widgetValues["comboData"] == ColorWidgetFunc.FEATURE:
+          useRenderer = True
+
+      elif widgetType == StyleWidget.FILEPATH:
+        if widgetValues["comboData"] != FilePathWidgetFunc.FILEPATH:
+          names.add(widgetValues["comboText"].strip('"'))
+
+      elif widgetValues["comboData"] != FieldValueWidgetFunc.ABSOLUTE:
+        names.add(widgetValues["comboText"].strip('"'))
+
+    # symbol for feature (and its data defined color) depends on attributes used by the renderer
+    if useRenderer:
+      names.update(self.layer.rendererV2().usedAttributes())
+
+    return list(names)
+
   # read values from style widgets
   def values(self, f=None):
     vals = []
@@ -376,6 +376,11 @@ class Qgis2threejsDialog(QDialog):
     settings.setValue("/Qgis2threejs/lastTemplate", templateName)
     settings.setValue("/Qgis2threejs/lastControls", context.controls)
 
+    if context.zipBundle:
+      # zip bundle cannot be opened with web browser
+      self.showMessageBar(u"Output has been bundled into {0}".format(htmlfilename))
+      return
+
     # open browser
     if not tools.openHTMLFile(htmlfilename):
       return
@@ -21,8 +21,11 @@
 """
 import os
 import codecs
+import math
 import datetime
-import re
+import json
+from array import array
+from itertools import islice
 
 from PyQt4.QtCore import QDir, QSettings, Qt, qDebug, QT_VERSION_STR
 from PyQt4.QtGui import QColor, QImage, QImageReader, QPainter, QMessageBox
@@ -34,9 +37,12 @@ except ImportError:
   import ogr
 
 import gdal2threejs
+import quantizedmesh
+import meshwriter
 import qgis2threejstools as tools
 from propertyreader import DEMPropertyReader, VectorPropertyReader
 from quadtree import QuadTree, DEMQuadList
+from jsencoder import JSEncoder
 
 debug_mode = 1
 apiChanged23 = QGis.QGIS_VERSION_INT >= 20300
@@ -52,7 +58,9 @@ class ObjectTreeItem:
   ITEM_LINE = 5
   ITEM_POLYGON = 6
 
-class Point:
+class Point(object):
+  __slots__ = ["x", "y", "z"]
+
   def __init__(self, x, y, z=0):
     self.x = x
     self.y = y
@@ -80,15 +88,55 @@ class MapTo3D:
     self.multiplier = planeWidth / mapCanvas.extent().width()
     self.multiplierZ = self.multiplier * verticalExaggeration
 
+    # offsets of the affine transformation: x' = x * multiplier + offsetX, ...
+    self.offsetX = -self.mapExtent.xMinimum() * self.multiplier - self.planeWidth / 2
+    self.offsetY = -self.mapExtent.yMinimum() * self.multiplier - self.planeHeight / 2
+    self.offsetZ = self.verticalShift * self.multiplierZ
+
   def transform(self, x, y, z=0):
-    extent = self.mapExtent
-    return Point((x - extent.xMinimum()) * self.multiplier - self.planeWidth / 2,
-                 (y - extent.yMinimum()) * self.multiplier - self.planeHeight / 2,
-                 (z + self.verticalShift) * self.multiplierZ)
+    return Point(x * self.multiplier + self.offsetX,
+                 y * self.multiplier + self.offsetY,
+                 z * self.multiplierZ + self.offsetZ)
 
   def transformPoint(self, pt):
     return self.transform(pt.x, pt.y, pt.z)
 
+  def transformArrays(self, xs, ys, zs, zAddend=0):
+    """ transform sequences of coordinates. returns a tuple of lists (xs, ys, zs).
+        zAddend is added to z coordinates before the transformation. """
+    m, mz = self.multiplier, self.multiplierZ
+    ox, oy, oz = self.offsetX, self.offsetY, self.offsetZ + zAddend * self.multiplierZ
+    return ([x * m + ox for x in xs],
+            [y * m + oy for y in ys],
+            [z * mz + oz for z in zs])
+
+
+class CoordinateQuantizer:
+  """ quantizes 3d coordinates to integers on a grid derived from plane width """
+
+  def __init__(self, mapTo3d, bits=16):
+    # grid interval
+    self.interval = float(mapTo3d.planeWidth) / 2 ** bits
+    self.offsetX = -mapTo3d.planeWidth / 2
+    self.offsetY = -mapTo3d.planeHeight / 2
+
+  def quantize(self, pt):
+    s = self.interval
+    return Point(int(round((pt.x - self.offsetX) / s)),
+                 int(round((pt.y - self.offsetY) / s)),
+                 int(round(pt.z / s)))
+
+  def quantizeArrays(self, xs, ys, zs):
+    """ quantize lists of coordinates. returns a tuple of lists (xs, ys, zs) """
+    s, ox, oy = self.interval, self.offsetX, self.offsetY
+    return ([int(round((x - ox) / s)) for x in xs],
+            [int(round((y - oy) / s)) for y in ys],
+            [int(round(z / s)) for z in zs])
+
+  def params(self):
+    # parameters to dequantize coordinates in the viewer: x = qx * s + o[0], ...
+    return {"s": self.interval, "o": [self.offsetX, self.offsetY, 0]}
+
 
 class OutputContext:
 
@@ -115,6 +163,13 @@ class OutputContext:
 
     world = properties[ObjectTreeItem.ITEM_WORLD] or {}
     self.coordsInWGS84 = world.get("radioButton_WGS84", False)
+    self.zipBundle = world.get("checkBox_ZipBundle", False)
+    self.writeSTL = world.get("checkBox_STL", False)
+    self.writeOBJ = world.get("checkBox_OBJ", False)
+
+    self.quantizer = None
+    if world.get("checkBox_Quantize", False):
+      self.quantizer = CoordinateQuantizer(mapTo3d, world.get("spinBox_QuantizeBits", 16))
 
     p = properties[ObjectTreeItem.ITEM_CONTROLS]
     if p is None:
@@ -134,12 +189,22 @@ class OutputContext:
       self.warp_dem = tools.FlatRaster()
 
     self.triMesh = None
+    self._demGrid = None
 
   def triangleMesh(self):
     if self.triMesh is None:
       self.triMesh = TriangleMesh.createFromContext(self)
     return self.triMesh
 
+  def demGrid(self):
+    # returns None in advanced mode. blocks of multi-resolution DEM have different resolutions,
+    # so lines are not draped (the viewer doesn't segmentize lines on multiple blocks either)
+    if not self.properties[ObjectTreeItem.ITEM_DEM].get("radioButton_Simple", False):
+      return None
+    if self._demGrid is None:
+      self._demGrid = DEMGrid.createFromContext(self)
+    return self._demGrid
+
 class DataManager:
   """ manages a list of unique items """
 
@@ -160,6 +225,7 @@ class ImageManager(DataManager):
   CANVAS_IMAGE = 2
   MAP_IMAGE = 3
   LAYER_IMAGE = 4
+  ATLAS_IMAGE = 5
 
   def __init__(self, context):
     DataManager.__init__(self)
@@ -182,12 +248,16 @@ class ImageManager(DataManager):
     img = (self.LAYER_IMAGE, (layerid, width, height, extent))
     return self._index(img)
 
+  def atlasImageIndex(self, atlas):
+    img = (self.ATLAS_IMAGE, atlas)
+    return self._index(img)
+
   def mapCanvasImage(self, transp_background=False):
     """ returns base64 encoded map canvas image """
     canvas = self.context.canvas
     if transp_background:
       size = self.context.mapSettings.outputSize()
-      return self.renderedImage(size.width(), size.height(), canvas.extent(), transp_background)
+      return tools.base64image(self.renderedImage(size.width(), size.height(), canvas.extent(), transp_background))
 
     if QGis.QGIS_VERSION_INT >= 20400:
      return tools.base64image(canvas.map().contentImage())
@@ -225,6 +295,7 @@ class ImageManager(DataManager):
     self.canvasColor = canvas.canvasColor()
 
   def renderedImage(self, width, height, extent, transp_background=False, layerids=None):
+    """ returns QImage of map rendered with layers in map canvas or given layers """
     antialias = True
 
     if self.renderer is None:
@@ -255,7 +326,7 @@ class ImageManager(DataManager):
     renderer.render(painter)
     painter.end()
 
-    return tools.base64image(image)
+    return image
 
     #if context.localBrowsingMode:
     #else:
@@ -283,11 +354,15 @@ class ImageManager(DataManager):
 
       elif imageType == self.MAP_IMAGE:
         width, height, extent, transp_background = image[1]
-        args = (index, width, height, self.renderedImage(width, height, extent, transp_background))
+        args = (index, width, height, tools.base64image(self.renderedImage(width, height, extent, transp_background)))
 
       elif imageType == self.LAYER_IMAGE:
         layerid, width, height, extent = image[1]
-        args = (index, width, height, self.renderedImage(width, height, extent, True, [layerid]))
+        args = (index, width, height, tools.base64image(self.renderedImage(width, height, extent, True, [layerid])))
+
+      elif imageType == self.ATLAS_IMAGE:
+        atlas = image[1]
+        args = (index, atlas.width, atlas.height, tools.base64image(atlas.image()))
 
       else:   #imageType == self.CANVAS_IMAGE:
         transp_background = image[1]
@@ -297,6 +372,146 @@ class ImageManager(DataManager):
       f.write(u'project.images[%d] = {width:%d,height:%d,data:"%s"};\n' % args)
 
 
+class ImageAtlas(DataManager):
+  """ packs image files into a power-of-two atlas image. size of the atlas image is MAX_SIZE at most """
+
+  PADDING = 1
+  MAX_SIZE = 4096
+
+  def __init__(self):
+    DataManager.__init__(self)
+    self._sizes = []
+    self._rects = None
+    self.width = self.height = 0
+
+  def hasImage(self, path):
+    return path in self._list
+
+  def addImage(self, path):
+    """ adds an image file and returns index of the image in the atlas.
+        returns None if the image doesn't fit in the atlas of the maximum size. """
+    if path in self._list:
+      return self._list.index(path)
+
+    size = self._readSize(path)
+    if self._pack(self._sizes + [size]) is None:
+      return None
+    self._sizes.append(size)
+    self._rects = None
+    return self._index(path)
+
+  def rects(self):
+    """ returns [x, y, width, height] of images in the atlas. origin is top-left corner. """
+    if self._rects is None:
+      self._rects, self.width, self.height = self._pack(self._sizes)
+    return self._rects
+
+  def image(self):
+    rects = self.rects()
+    image = QImage(self.width, self.height, QImage.Format_ARGB32)
+    image.fill(QColor(Qt.transparent).rgba())
+    painter = QPainter()
+    painter.begin(image)
+    for path, rect in zip(self._list, rects):
+      if rect[2]:
+        painter.drawImage(rect[0], rect[1], QImage(path))
+    painter.end()
+    return image
+
+  def _readSize(self, path):
+    size = QImageReader(path).size() if os.path.exists(path) else None
+    if size is None or not size.isValid():
+      QgsMessageLog.logMessage(u'Image file not found: {0}'.format(path), "Qgis2threejs")
+      return (0, 0)
+    return (size.width(), size.height())
+
+  def _pack(self, sizes):
+    # shelf packing. images are placed in rows in descending order of height.
+    # returns a tuple (rects, width, height), or None if the atlas exceeds MAX_SIZE.
+    pad = self.PADDING
+    area = sum([(w + 2 * pad) * (h + 2 * pad) for w, h in sizes])
+    width = powerOfTwo(max([math.sqrt(area)] + [w + 2 * pad for w, h in sizes]))
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+
+    # widen the atlas while it is too tall
+    while width <= self.MAX_SIZE:
+      rects = [None] * len(sizes)
+      x = y = rowHeight = 0
+      for i in order:
+        w, h = sizes[i]
+        if x + w + 2 * pad > width:
+          x = 0
+          y += rowHeight
+          rowHeight = 0
+        rects[i] = [x + pad, y + pad, w, h]
+        x += w + 2 * pad
+        rowHeight = max(rowHeight, h + 2 * pad)
+
+      height = powerOfTwo(y + rowHeight)
+      if height <= self.MAX_SIZE:
+        return rects, width, height
+      width *= 2
+    return None
+
+
+class MapImageAtlas:
+  """ packs rendered map images of the same size into an atlas image in a grid """
+
+  MAX_SIZE = 4096
+
+  def __init__(self, imageManager, imageWidth, imageHeight, count, transp_background=False, layerid=None):
+    self.imageManager = imageManager
+    self.imageWidth = int(imageWidth)
+    self.imageHeight = int(imageHeight)
+    self.transp_background = transp_background
+    self.layerids = None if layerid is None else [layerid]
+    self.extents = []
+
+    maxColumns = max(1, self.MAX_SIZE // self.imageWidth)
+    maxRows = max(1, self.MAX_SIZE // self.imageHeight)
+    self.columns = min(count, maxColumns)
+    self.rows = min(int(math.ceil(float(count) / self.columns)), maxRows)
+    self.width = self.columns * self.imageWidth
+    self.height = self.rows * self.imageHeight
+
+  def isFull(self):
+    return len(self.extents) >= self.columns * self.rows
+
+  def addImage(self, extent):
+    """ adds an image of given extent and returns [offsetX, offsetY, scaleX, scaleY] of texture coordinates """
+    index = len(self.extents)
+    self.extents.append(extent)
+
+    # inset by half a pixel to avoid bleeding of neighboring images
+    col, row = index % self.columns, index // self.columns
+    w, h = float(self.width), float(self.height)
+    return [(col * self.imageWidth + 0.5) / w,
+            1 - ((row + 1) * self.imageHeight - 0.5) / h,
+            (self.imageWidth - 1) / w,
+            (self.imageHeight - 1) / h]
+
+  def image(self):
+    image = QImage(self.width, self.height, QImage.Format_ARGB32_Premultiplied)
+    image.fill(QColor(Qt.transparent).rgba())
+    painter = QPainter()
+    painter.begin(image)
+    for index, extent in enumerate(self.extents):
+      x = (index % self.columns) * self.imageWidth
+      y = (index // self.columns) * self.imageHeight
+      if self.layerids is None:
+        img = self.imageManager.renderedImage(self.imageWidth, self.imageHeight, extent, self.transp_background)
+      else:
+        img = self.imageManager.renderedImage(self.imageWidth, self.imageHeight, extent, True, self.layerids)
+      painter.drawImage(x, y, img)
+    painter.end()
+    return image
+
+
+def powerOfTwo(value):
+  """ returns the smallest power of two that is not less than value """
+  return 2 ** int(math.ceil(math.log(max(value, 1), 2)))
+
+
 class MaterialManager(DataManager):
 
   MESH_LAMBERT = 0
@@ -312,11 +527,14 @@ class MaterialManager(DataManager):
   MAP_IMAGE = 21
   LAYER_IMAGE = 22
   IMAGE_FILE = 23
+  SPRITE_ATLAS = 24
+  MAP_IMAGE_ATLAS = 25
 
   ERROR_COLOR = "0"
 
   def __init__(self):
     DataManager.__init__(self)
+    self.spriteAtlases = []   # pages of sprite atlas (ImageAtlas objects)
 
   def _indexCol(self, type, color, transparency=0, doubleSide=False):
     if color[0:2] != "0x":
@@ -351,6 +569,10 @@ class MaterialManager(DataManager):
     mat = (self.LAYER_IMAGE, (layerid, width, height, extent), transparency, True)
     return self._index(mat)
 
+  def getMapImageAtlasIndex(self, atlas, transparency=0):
+    mat = (self.MAP_IMAGE_ATLAS, atlas, transparency, True)
+    return self._index(mat)
+
   def getImageFileIndex(self, path, transparency=0, doubleSide=False):
     mat = (self.IMAGE_FILE, path, transparency, doubleSide)
     return self._index(mat)
@@ -359,6 +581,28 @@ class MaterialManager(DataManager):
     mat = (self.SPRITE, path, transparency, False)
     return self._index(mat)
 
+  def getSpriteAtlasIndex(self, path, transparency=0):
+    """ returns indices of a sprite material and the image in the atlas shared by sprites of the layer.
+        a new atlas page is started when the image doesn't fit in the current page. """
+    atlas = None
+    for page in self.spriteAtlases:
+      if page.hasImage(path):
+        atlas = page
+        break
+
+    if atlas is None and self.spriteAtlases and self.spriteAtlases[-1].addImage(path) is not None:
+      atlas = self.spriteAtlases[-1]
+
+    if atlas is None:
+      atlas = ImageAtlas()
+      if atlas.addImage(path) is None:
+        # image is larger than the maximum atlas size. it has its own texture
+        return self.getSpriteIndex(path, transparency), 0
+      self.spriteAtlases.append(atlas)
+
+    mat = (self.SPRITE_ATLAS, atlas, transparency, False)
+    return self._index(mat), atlas.addImage(path)
+
   def write(self, f, imageManager):
     if not len(self._list):
       return
@@ -368,7 +612,9 @@ class MaterialManager(DataManager):
                       self.CANVAS_IMAGE: self.MESH_PHONG,
                       self.MAP_IMAGE: self.MESH_PHONG,
                       self.LAYER_IMAGE: self.MESH_PHONG,
-                      self.IMAGE_FILE: self.MESH_PHONG}
+                      self.IMAGE_FILE: self.MESH_PHONG,
+                      self.MAP_IMAGE_ATLAS: self.MESH_PHONG,
+                      self.SPRITE_ATLAS: self.SPRITE}
 
     for index, mat in enumerate(self._list):
       m = {"type": toMaterialType.get(mat[0], mat[0])}
@@ -385,6 +631,12 @@ class MaterialManager(DataManager):
       elif mat[0] in [self.IMAGE_FILE, self.SPRITE]:
         filepath = mat[1]
         m["i"] = imageManager.imageIndex(filepath)
+      elif mat[0] == self.MAP_IMAGE_ATLAS:
+        m["i"] = imageManager.atlasImageIndex(mat[1])
+      elif mat[0] == self.SPRITE_ATLAS:
+        atlas = mat[1]
+        m["i"] = imageManager.atlasImageIndex(atlas)
+        m["r"] = atlas.rects()
       else:
         m["c"] = mat[1]
 
@@ -434,16 +686,36 @@ class JSWriter:
     self.context = context
     self.jsfile = None
     self.jsindex = -1
-    self.jsfile_count = 0
+    self.bundle = None    # ZipBundle object. files are written into it if set
+    self.manifestLayers = []    # data files that each layer is written to
+    self.jsfiles = []     # names of written data files in order
+    self.jsnames = []     # positional names of the data files (before renamed by content hash)
+    self.filesize = 0     # size of data written to current file in bytes
+    self.buffer = []
+    self.bufferedSize = 0
+    self.bufferSize = 65536
+    self.chunkSize = 4096   # number of values formatted at a time in writeValues()
     self.layerCount = 0
     self.currentLayerIndex = 0
     self.currentFeatureIndex = -1
     self.attrs = []
+    self.attrFileFeatureCount = 1000
+    self.attrDictMaxRatio = 0.5   # max ratio of distinct values to features for dictionary encoding
+    self.encoder = JSEncoder(null=NULL)
+    self.attrEncoder = JSEncoder(escape=True, null=NULL)
     self.imageManager = ImageManager(context)
     self.jsonManager = JSONManager()
+    self.modelWriters = []    # writers of 3D model files (meshwriter.MeshWriter objects)
     #TODO: integrate OutputContext and JSWriter => ThreeJSExporter
     #TODO: written flag
 
+    # data file is split when its size exceeds this value (0: no limit)
+    world = context.properties[ObjectTreeItem.ITEM_WORLD] or {}
+    self.maxFileSize = world.get("spinBox_MaxFileSize", 0) * 1024
+
+    # name data files by content hash and write a manifest file
+    self.hashNames = world.get("checkBox_HashNames", False)
+
   def setContext(self, context):
     self.context = context
 
@@ -454,18 +726,68 @@ class JSWriter:
       jsfilename = os.path.splitext(self.htmlfilename)[0] + ".js"
     else:
       jsfilename = os.path.splitext(self.htmlfilename)[0] + "_%d.js" % self.jsindex
-    self.jsfile = codecs.open(jsfilename, "w", "UTF-8")
-    self.jsfile_count += 1
+    self.jsfile = self.openOutputFile(jsfilename)
+    self.jsfiles.append(os.path.split(jsfilename)[1])
+    self.jsnames.append(self.jsfiles[-1])
+    self.filesize = 0
+
+  def openOutputFile(self, filename, hashName=None):
+    # returns a file object to write binary data to. its name attribute is
+    # the final file name after it has been closed.
+    if self.bundle:
+      f = self.bundle.open(os.path.split(filename)[1])
+    else:
+      f = open(filename, "wb")
+    if hashName is None:
+      hashName = self.hashNames
+    if hashName:
+      return tools.HashedFile(f)
+    return f
 
   def closeFile(self):
     if self.jsfile:
+      self.flush()
       self.jsfile.close()
+      self.jsfiles[-1] = os.path.split(self.jsfile.name)[1]
       self.jsfile = None
 
   def write(self, data):
+    # data is encoded in UTF-8 and buffered. buffer is flushed when its size exceeds bufferSize
     if self.jsfile is None:
       self.openFile()
-    self.jsfile.write(data)
+    if isinstance(data, unicode):
+      data = data.encode("UTF-8")
+    elif not isinstance(data, str):
+      data = str(data)    # buffer, bytearray
+    self.buffer.append(data)
+    self.bufferedSize += len(data)
+    self.filesize += len(data)
+    if self.bufferedSize >= self.bufferSize:
+      self.flush()
+
+  def writeValues(self, values, formatFunc=unicode):
+    # write comma separated values. values can be any iterable.
+    # values are formatted and written chunkSize values at a time to keep memory usage low.
+    it = iter(values)
+    sep = ""
+    while True:
+      chunk = list(islice(it, self.chunkSize))
+      if not chunk:
+        break
+      self.write(sep + ",".join(map(formatFunc, chunk)))
+      sep = ","
+
+  def flush(self):
+    if self.buffer:
+      self.jsfile.write("".join(self.buffer))
+      self.buffer = []
+      self.bufferedSize = 0
+
+  def splitFileIfLarge(self):
+    # start a new file if current file is larger than the limit.
+    # call this only at layer or feature boundaries.
+    if self.maxFileSize and self.jsfile and self.filesize >= self.maxFileSize:
+      self.openFile(True)
 
   def writeProject(self):
     # write project information
@@ -487,6 +809,7 @@ class JSWriter:
     self.write(u"project = new Q3D.Project({0});\n".format(pyobj2js(opt)))
 
   def writeLayer(self, obj, fieldNames=None):
+    self.splitFileIfLarge()
     self.currentLayerIndex = self.layerCount
     type2classprefix = {"dem": "DEM", "point": "Point", "line": "Line", "polygon": "Polygon"}
     self.write(u"\n// Layer {0}\n".format(self.currentLayerIndex))
@@ -495,21 +818,177 @@ class JSWriter:
 
     if fieldNames is not None:
       self.write(u"lyr.a = {0};\n".format(pyobj2js(fieldNames)))
+    self.manifestLayers.append({"name": obj.get("name"), "type": obj["type"], "files": [], "blocks": [], "attrs": []})
+    self.updateManifest()
     self.layerCount += 1
     self.currentFeatureIndex = -1
     self.attrs = []
     return self.currentLayerIndex
 
   def writeFeature(self, f):
+    self.splitFileIfLarge()
     self.currentFeatureIndex += 1
-    self.write(u"lyr.f[{0}] = {1};\n".format(self.currentFeatureIndex, pyobj2js(f)))
+    self.write(u"lyr.f[{0}] = ".format(self.currentFeatureIndex))
+    self.encoder.encodeTo(f, self.write)
+    self.write(u";\n")
+    self.updateManifest()
+
+    if self.modelWriters and "faces" in f:
+      self.writeExtrudedPolygonModel(f)
+
+  def openModelFiles(self):
+    filetitle = os.path.splitext(self.htmlfilename)[0]
+    if self.context.writeSTL:
+      self.modelWriters.append(meshwriter.STLWriter(self.openOutputFile(filetitle + ".stl", hashName=False)))
+    if self.context.writeOBJ:
+      self.modelWriters.append(meshwriter.OBJWriter(self.openOutputFile(filetitle + ".obj", hashName=False)))
+
+  def closeModelFiles(self):
+    for w in self.modelWriters:
+      w.close()
+    self.modelWriters = []
+
+  def writeExtrudedPolygonModel(self, f):
+    # coordinates of polygons are quantized if the quantizer is enabled
+    q = self.context.quantizer
+    s, o = (q.interval, [q.offsetX, q.offsetY]) if q else (1, [0, 0])
+    for polygon, faces, z in zip(f["polygons"], f["faces"], f["zs"]):
+      if q:
+        polygon = [[(pt[0] * s + o[0], pt[1] * s + o[1]) for pt in ring] for ring in polygon]
+      for w in self.modelWriters:
+        w.addExtrudedPolygon(polygon, z * s, f["h"], faces)
+
+  def writeBlock(self, dem, values, quantizedMesh=False):
+    plane = dem["plane"]
+    for w in self.modelWriters:
+      w.addGrid(dem["width"], dem["height"], values, plane["width"], plane["height"], plane["offsetX"], plane["offsetY"], dem.get("s", False))
+
+    self.write(u"bl = lyr.addBlock({0});\n".format(pyobj2js(dem)))
+    self.writeBlockValues(dem, values, quantizedMesh)
+    self.updateManifest(block=True)
+
+  def writeBlockValues(self, dem, values, quantizedMesh=False):
+    if quantizedMesh:
+      self.write("bl.qm = ")
+      self.encoder.encodeTo(quantizedmesh.encodeGrid(dem["width"], dem["height"], values), self.write)
+      self.write(";\n")
+    else:
+      self.write("bl.data = [")
+      self.writeValues(values, gdal2threejs.formatValue)
+      self.write("];\n")
+
+  def writeTile(self, filename, level, x, y, dem, values, quantizedMesh=False):
+    # write a tile of DEM pyramid into a separate file in the same format as blocks.
+    # returns the name of the written file.
+    if self.jsfile:
+      self.flush()
+    currentFile, filesize = self.jsfile, self.filesize
+
+    # switch output to the tile file temporarily
+    tileFile = self.jsfile = self.openOutputFile(filename)
+    self.write(u"lyr = project.layers[{0}];\n".format(self.currentLayerIndex))
+    self.write(u"bl = lyr.addTile({0},{1},{2},{3});\n".format(level, x, y, pyobj2js(dem)))
+    self.writeBlockValues(dem, values, quantizedMesh)
+    self.flush()
+    tileFile.close()
+
+    self.jsfile, self.filesize = currentFile, filesize
+    return os.path.split(tileFile.name)[1]
+
+  def updateManifest(self, block=False):
+    # record index of current data file for current layer
+    lyr = self.manifestLayers[-1]
+    index = len(self.jsfiles) - 1
+    if not lyr["files"] or lyr["files"][-1] != index:
+      lyr["files"].append(index)
+    if block:
+      lyr["blocks"].append(index)
 
   def addAttributes(self, attrs):
     self.attrs.append(attrs)
 
-  def writeAttributes(self):
+  def encodeAttributes(self):
+    # dictionary-encode string columns with low cardinality. values of the encoded columns
+    # are replaced with indices into per-column string tables, which are written to lyr.ad.
+    count = len(self.attrs)
+    if count < 2:
+      return
+
+    tables = {}
+    for col in range(len(self.attrs[0])):
+      values = [attrs[col] for attrs in self.attrs]
+      if not all(isinstance(v, basestring) for v in values):
+        continue
+      distinct = sorted(set(values))
+      if len(distinct) > count * self.attrDictMaxRatio:
+        continue
+      codes = dict((v, i) for i, v in enumerate(distinct))
+      for attrs in self.attrs:
+        attrs[col] = codes[attrs[col]]
+      tables[col] = distinct
+
+    if tables:
+      self.write(u"lyr.ad = {0};\n".format(pyobj2js(tables, True)))
+
+  def writeAttributes(self, onDemand=False):
+    self.encodeAttributes()
+    if onDemand:
+      self.writeAttributeFiles()
+      return
+
     for index, attrs in enumerate(self.attrs):
-      self.write(u"lyr.f[{0}].a = {1};\n".format(index, pyobj2js(attrs, True)))
+      self.splitFileIfLarge()
+      self.write(u"lyr.f[{0}].a = ".format(index))
+      self.attrEncoder.encodeTo(attrs, self.write)
+      self.write(u";\n")
+      self.updateManifest()
+
+  def writeAttributeFiles(self):
+    # write attributes into separate files, each of which has attributes of attrFileFeatureCount features.
+    # the viewer loads a file when one of its features is queried.
+    filetitle = os.path.splitext(self.htmlfilename)[0]
+    count = self.attrFileFeatureCount
+    filenames = []
+    for start in range(0, len(self.attrs), count):
+      filename = u"{0}_a{1}_{2}.js".format(filetitle, self.currentLayerIndex, start / count)
+      with self.openOutputFile(filename) as f:
+        f.write("project.layers[{0}].setAttributes({1},[\n".format(self.currentLayerIndex, start))
+        sep = ""
+        for attrs in self.attrs[start:start + count]:
+          f.write(sep + self.attrEncoder.encode(attrs).encode("UTF-8"))
+          sep = ",\n"
+        f.write("]);\n")
+      filenames.append(os.path.split(f.name)[1])
+
+    self.manifestLayers[-1]["attrs"] = filenames
+
+    self.write(u"lyr.af = {0};\n".format(pyobj2js({"n": count, "files": filenames})))
+
+  def writeManifest(self):
+    # write a manifest file that maps layers and blocks to data files
+    names = self.jsfiles
+    layers = []
+    for index, lyr in enumerate(self.manifestLayers):
+      layers.append({"index": index,
+                     "name": lyr["name"],
+                     "type": lyr["type"],
+                     "files": [names[i] for i in lyr["files"]],
+                     "blocks": [names[i] for i in lyr["blocks"]],
+                     "attrs": lyr["attrs"]})
+      if "tiles" in lyr:
+        layers[-1]["tiles"] = lyr["tiles"]    # tile files of each level of DEM pyramid
+
+    # positional name (e.g. title_3.js) -> content hashed name
+    positions = [{"index": i, "name": name, "file": names[i]} for i, name in enumerate(self.jsnames)]
+
+    manifest = {"html": os.path.split(self.htmlfilename)[1],
+                "files": names,
+                "positions": positions,
+                "layers": layers}
+
+    filename = os.path.splitext(self.htmlfilename)[0] + "_manifest.json"
+    with self.openOutputFile(filename, hashName=False) as f:
+      f.write(json.dumps(manifest, indent=2))
 
   def writeMaterials(self, materialManager):
     materialManager.write(self, self.imageManager)
@@ -540,11 +1019,8 @@ class JSWriter:
       # display coordinates in latitude and longitude
       lines.append('<script src="./proj4js/proj4.js"></script>')
 
-    filetitle = os.path.splitext(os.path.split(self.htmlfilename)[1])[0]
-    if self.jsindex == -1:
-      lines.append('<script src="./%s.js"></script>' % filetitle)
-    else:
-      lines += map(lambda x: '<script src="./%s_%s.js"></script>' % (filetitle, x), range(self.jsfile_count))
+    # data files in the order they were written
+    lines += map(lambda x: '<script src="./%s"></script>' % x, self.jsfiles)
     return "\n".join(lines)
 
   def log(self, message):
@@ -564,68 +1040,94 @@ def exportToThreeJS(htmlfilename, context, progress=None):
 
   # create JavaScript writer object
   writer = JSWriter(htmlfilename, context)
+  if context.zipBundle:
+    writer.bundle = tools.ZipBundle(os.path.splitext(htmlfilename)[0] + ".zip")
 
-  # read configuration of the template
-  templatePath = os.path.join(tools.templateDir(), context.templateName)
-  templateConfig = tools.getTemplateConfig(templatePath)
-  templateType = templateConfig.get("type", "plain")
-  if templateType == "sphere":
-    writer.openFile(False)
-    # render texture for sphere and write it
-    progress(5, "Rendering texture")
-    writeSphereTexture(writer)
-  else:
-    # plain type
-    demProperties = context.properties[ObjectTreeItem.ITEM_DEM]
-    isSimpleMode = demProperties.get("radioButton_Simple", False)
-    writer.openFile(not isSimpleMode)
-    writer.writeProject()
-    progress(5, "Writing DEM")
-
-    # write primary DEM
-    if isSimpleMode:
-      writeSimpleDEM(writer, demProperties, progress)
+  try:
+    # read configuration of the template
+    templatePath = os.path.join(tools.templateDir(), context.templateName)
+    templateConfig = tools.getTemplateConfig(templatePath)
+    templateType = templateConfig.get("type", "plain")
+    if templateType == "sphere":
+      writer.openFile(False)
+      # render texture for sphere and write it
+      progress(5, "Rendering texture")
+      writeSphereTexture(writer)
     else:
-      writeMultiResDEM(writer, demProperties, progress)
-      writer.prepareNext()
+      # plain type
+      demProperties = context.properties[ObjectTreeItem.ITEM_DEM]
+      isSimpleMode = demProperties.get("radioButton_Simple", False)
+      writer.openFile(not isSimpleMode)
+      writer.writeProject()
+      writer.openModelFiles()
+      progress(5, "Writing DEM")
+
+      # write primary DEM
+      if isSimpleMode:
+        writeSimpleDEM(writer, demProperties, progress)
+      elif demProperties.get("checkBox_Pyramid", False):
+        writePyramidDEM(writer, demProperties, progress)
+        writer.prepareNext()
+      else:
+        writeMultiResDEM(writer, demProperties, progress)
+        writer.prepareNext()
 
-    # write additional DEM(s)
-    primaryDEMLayerId = demProperties["comboBox_DEMLayer"]
-    for layerId, properties in context.properties[ObjectTreeItem.ITEM_OPTDEM].iteritems():
-      if layerId != primaryDEMLayerId and properties.get("visible", False):
-        writeSimpleDEM(writer, properties)
+      # write additional DEM(s)
+      primaryDEMLayerId = demProperties["comboBox_DEMLayer"]
+      for layerId, properties in context.properties[ObjectTreeItem.ITEM_OPTDEM].iteritems():
+        if layerId != primaryDEMLayerId and properties.get("visible", False):
+          writeSimpleDEM(writer, properties)
 
-    progress(30, "Writing vector data")
+      progress(30, "Writing vector data")
 
-    # write vector data
-    writeVectors(writer, progress)
+      # write vector data
+      writeVectors(writer, progress)
 
-  # write images and JSON data
-  progress(60, "Writing texture images")
-  writer.writeImages()
-  writer.writeJSONData()
+    writer.closeModelFiles()
 
-  progress(90, "Copying library files")
+    # write images and JSON data
+    progress(60, "Writing texture images")
+    writer.writeImages()
+    writer.writeJSONData()
+    writer.closeFile()
+    if writer.hashNames:
+      writer.writeManifest()
 
-  # copy three.js files
-  tools.copyThreejsFiles(out_dir, context.controls)
+    progress(90, "Copying library files")
 
-  # copy proj4js files
-  if context.coordsInWGS84:
-    tools.copyProj4js(out_dir)
+    if writer.bundle:
+      # add library files to the bundle
+      tools.bundleLibraries(writer.bundle, templateConfig, context.controls, context.coordsInWGS84)
+    else:
+      # copy three.js files
+      tools.copyThreejsFiles(out_dir, context.controls)
 
-  # copy additional library files
-  tools.copyLibraries(out_dir, templateConfig)
+      # copy proj4js files
+      if context.coordsInWGS84:
+        tools.copyProj4js(out_dir)
 
-  # generate html file
-  with codecs.open(templatePath, "r", "UTF-8") as f:
-    html = f.read()
+      # copy additional library files
+      tools.copyLibraries(out_dir, templateConfig)
 
-  filetitle = os.path.splitext(filename)[0]
-  with codecs.open(htmlfilename, "w", "UTF-8") as f:
-    f.write(html.replace("${title}", filetitle).replace("${controls}", '<script src="./threejs/%s"></script>' % context.controls).replace("${options}", writer.options()).replace("${scripts}", writer.scripts()))
+    # generate html file
+    with codecs.open(templatePath, "r", "UTF-8") as f:
+      html = f.read()
+
+    filetitle = os.path.splitext(filename)[0]
+    html = html.replace("${title}", filetitle).replace("${controls}", '<script src="./threejs/%s"></script>' % context.controls).replace("${options}", writer.options()).replace("${scripts}", writer.scripts())
+
+    if writer.bundle:
+      writer.bundle.writeData(filename, html.encode("UTF-8"))
+      return writer.bundle.filename
+
+    with codecs.open(htmlfilename, "w", "UTF-8") as f:
+      f.write(html)
 
-  return htmlfilename
+    return htmlfilename
+  finally:
+    # close the bundle even if export has failed, so that temporary files of its entries are removed
+    if writer.bundle:
+      writer.bundle.close()
 
 def writeSimpleDEM(writer, properties, progress=None):
   context = writer.context
@@ -723,8 +1225,7 @@ def writeSimpleDEM(writer, properties, progress=None):
   lyrIdx = writer.writeLayer(lyr)
 
   # write central block
-  writer.write("bl = lyr.addBlock({0});\n".format(pyobj2js(dem)))
-  writer.write("bl.data = [{0}];\n".format(",".join(map(gdal2threejs.formatValue, dem_values))))
+  writer.writeBlock(dem, dem_values)
 
   # write surrounding dems
   if surroundings:
@@ -854,10 +1355,75 @@ def writeSurroundingDEM(writer, layer, stats, properties, progress=None):
       dem["shading"] = True
 
     # write block
-    writer.write("bl = lyr.addBlock({0});\n".format(pyobj2js(dem)))
-    writer.write("bl.data = [{0}];\n".format(",".join(map(gdal2threejs.formatValue, dem_values))))
+    writer.writeBlock(dem, dem_values)
     plane_index += 1
 
+def blockImageSize(context, columns=1, rows=1):
+  # size of texture image of a block that consists of columns x rows quads.
+  # longer side of a quad image is image_basesize.
+  baseExtent = context.baseExtent
+  hpw = baseExtent.height() / baseExtent.width()
+  if hpw < 1:
+    image_width = context.image_basesize * columns
+    image_height = round(image_width * hpw)
+  else:
+    image_height = context.image_basesize * rows
+    image_width = round(image_height / hpw)
+  return image_width, image_height
+
+def warpBlockDEM(warp_dem, wkt, extent, width, height):
+  # output dem should be handled as points.
+  xres = extent.width() / (width - 1)
+  yres = extent.height() / (height - 1)
+  geotransform = [extent.xMinimum() - xres / 2, xres, 0, extent.yMaximum() + yres / 2, 0, -yres]
+  if debug_mode:
+    qDebug("Warped DEM: %d x %d, extent %s" % (width, height, str(geotransform)))
+  return warp_dem.read(width, height, wkt, geotransform)
+
+def shiftDEMValues(values, mapTo3d):
+  # shift and scale
+  if mapTo3d.verticalShift != 0:
+    values = map(lambda x: x + mapTo3d.verticalShift, values)
+  if mapTo3d.multiplierZ != 1:
+    values = map(lambda x: x * mapTo3d.multiplierZ, values)
+  return values
+
+def blockPlane(mapTo3d, baseExtent, extent):
+  planeWidth = mapTo3d.planeWidth * extent.width() / baseExtent.width()
+  planeHeight = mapTo3d.planeHeight * extent.height() / baseExtent.height()
+  offsetX = mapTo3d.planeWidth * (extent.xMinimum() - baseExtent.xMinimum()) / baseExtent.width() + planeWidth / 2 - mapTo3d.planeWidth / 2
+  offsetY = mapTo3d.planeHeight * (extent.yMinimum() - baseExtent.yMinimum()) / baseExtent.height() + planeHeight / 2 - mapTo3d.planeHeight / 2
+  return {"width": planeWidth, "height": planeHeight, "offsetX": offsetX, "offsetY": offsetY}
+
+def setBlockMaterial(dem, writer, layer, properties, image_width, image_height, extent, inlineImage=False):
+  # set material of a block for the display type. if inlineImage is True, texture image
+  # is written into the block data (tiles of DEM pyramid) instead of the image list of project.
+  transparency = properties["spinBox_demtransp"]
+  transp_background = properties.get("checkBox_TransparentBackground", False)
+  imageLayerId = properties.get("comboBox_ImageLayer")
+  materialManager = layer.materialManager
+
+  if properties.get("radioButton_MapCanvas", False):
+    if inlineImage:
+      dem["t"] = {"data": tools.base64image(writer.imageManager.renderedImage(image_width, image_height, extent, transp_background))}
+    else:
+      dem["m"] = materialManager.getMapImageIndex(image_width, image_height, extent, transparency, transp_background)
+
+  elif properties.get("radioButton_LayerImage", False):
+    if inlineImage:
+      dem["t"] = {"data": tools.base64image(writer.imageManager.renderedImage(image_width, image_height, extent, True, [imageLayerId]))}
+    else:
+      dem["m"] = materialManager.getLayerImageIndex(imageLayerId, image_width, image_height, extent, transparency)
+
+  elif properties.get("radioButton_SolidColor", False):
+    dem["m"] = materialManager.getMeshLambertIndex(properties["lineEdit_Color"], transparency, True)
+
+  elif properties.get("radioButton_Wireframe", False):
+    dem["m"] = materialManager.getWireframeIndex(properties["lineEdit_Color"], transparency)
+
+  if "t" in dem and transparency > 0:
+    dem["t"]["o"] = 1.0 - float(transparency) / 100
+
 def writeMultiResDEM(writer, properties, progress=None):
   context = writer.context
   mapTo3d = context.mapTo3d
@@ -877,6 +1443,8 @@ def writeMultiResDEM(writer, properties, progress=None):
   transparency = properties["spinBox_demtransp"]
   transp_background = properties.get("checkBox_TransparentBackground", False)
   imageLayerId = properties.get("comboBox_ImageLayer")
+  quantizedMesh = properties.get("checkBox_QuantizedMesh", False)
+  useAtlas = properties.get("checkBox_TextureAtlas", False) and (properties.get("radioButton_MapCanvas", False) or properties.get("radioButton_LayerImage", False))
 
   # layer
   layer = DEMLayer(context, demlayer, prop)
@@ -895,13 +1463,7 @@ def writeMultiResDEM(writer, properties, progress=None):
   context.dialog.createRubberBands(quads, quadtree.focusRect.center())
 
   # image size
-  hpw = baseExtent.height() / baseExtent.width()
-  if hpw < 1:
-    image_width = context.image_basesize
-    image_height = round(image_width * hpw)
-  else:
-    image_height = context.image_basesize
-    image_width = round(image_height / hpw)
+  image_width, image_height = blockImageSize(context)
 
   # (currently) dem size should be 2 ^ quadtree.height * a + 1, where a is larger integer than 0
   # with smooth resolution change, this is not necessary
@@ -912,6 +1474,15 @@ def writeMultiResDEM(writer, properties, progress=None):
 
   unites_center = True
   centerQuads = DEMQuadList(dem_width, dem_height)
+
+  # number of quads of each level whose textures are packed into atlases
+  atlases = {}
+  atlasImageCount = {}
+  if useAtlas:
+    for quad in quads:
+      if quad.height < quadtree.height or unites_center == False:
+        atlasImageCount[quad.height] = atlasImageCount.get(quad.height, 0) + 1
+
   scripts = []
   stats = None
   plane_index = 0
@@ -919,32 +1490,15 @@ def writeMultiResDEM(writer, properties, progress=None):
     progress(30 * i / len(quads) + 5)
     extent = quad.extent
 
-    # calculate extent. output dem should be handled as points.
-    xres = extent.width() / (dem_width - 1)
-    yres = extent.height() / (dem_height - 1)
-    geotransform = [extent.xMinimum() - xres / 2, xres, 0, extent.yMaximum() + yres / 2, 0, -yres]
-
     # warp dem
-    dem_values = warp_dem.read(dem_width, dem_height, wkt, geotransform)
+    dem_values = warpBlockDEM(warp_dem, wkt, extent, dem_width, dem_height)
     if stats is None:
       stats = {"max": max(dem_values), "min": min(dem_values)}
     else:
       stats["max"] = max(max(dem_values), stats["max"])
       stats["min"] = min(min(dem_values), stats["min"])
 
-    # shift and scale
-    if mapTo3d.verticalShift != 0:
-      dem_values = map(lambda x: x + mapTo3d.verticalShift, dem_values)
-    if mapTo3d.multiplierZ != 1:
-      dem_values = map(lambda x: x * mapTo3d.multiplierZ, dem_values)
-    if debug_mode:
-      qDebug("Warped DEM: %d x %d, extent %s" % (dem_width, dem_height, str(geotransform)))
-
-    # generate javascript data file
-    planeWidth = mapTo3d.planeWidth * extent.width() / baseExtent.width()
-    planeHeight = mapTo3d.planeHeight * extent.height() / baseExtent.height()
-    offsetX = mapTo3d.planeWidth * (extent.xMinimum() - baseExtent.xMinimum()) / baseExtent.width() + planeWidth / 2 - mapTo3d.planeWidth / 2
-    offsetY = mapTo3d.planeHeight * (extent.yMinimum() - baseExtent.yMinimum()) / baseExtent.height() + planeHeight / 2 - mapTo3d.planeHeight / 2
+    dem_values = shiftDEMValues(dem_values, mapTo3d)
 
     # value resampling on edges for combination with different resolution DEM
     neighbors = quadtree.neighbors(quad)
@@ -976,20 +1530,20 @@ def writeMultiResDEM(writer, properties, progress=None):
 
     if quad.height < quadtree.height or unites_center == False:
       dem = {"width": dem_width, "height": dem_height}
-      dem["plane"] = {"width": planeWidth, "height": planeHeight, "offsetX": offsetX, "offsetY": offsetY}
+      dem["plane"] = blockPlane(mapTo3d, baseExtent, extent)
 
       # display type
-      if properties.get("radioButton_MapCanvas", False):
-        dem["m"] = layer.materialManager.getMapImageIndex(image_width, image_height, extent, transparency, transp_background)
-
-      elif properties.get("radioButton_LayerImage", False):
-        dem["m"] = layer.materialManager.getLayerImageIndex(imageLayerId, image_width, image_height, extent, transparency)
-
-      elif properties.get("radioButton_SolidColor", False):
-        dem["m"] = layer.materialManager.getMeshLambertIndex(properties["lineEdit_Color"], transparency, True)
-
-      elif properties.get("radioButton_Wireframe", False):
-        dem["m"] = layer.materialManager.getWireframeIndex(properties["lineEdit_Color"], transparency)
+      if useAtlas:
+        atlas = atlases.get(quad.height)
+        if atlas is None or atlas.isFull():
+          layerid = imageLayerId if properties.get("radioButton_LayerImage", False) else None
+          atlas = MapImageAtlas(writer.imageManager, image_width, image_height, atlasImageCount[quad.height], transp_background, layerid)
+          atlases[quad.height] = atlas
+        atlasImageCount[quad.height] -= 1
+        dem["m"] = layer.materialManager.getMapImageAtlasIndex(atlas, transparency)
+        dem["uv"] = atlas.addImage(extent)
+      else:
+        setBlockMaterial(dem, writer, layer, properties, image_width, image_height, extent)
 
       # shading (whether compute normals)
       if properties.get("checkBox_Shading", True):
@@ -997,8 +1551,7 @@ def writeMultiResDEM(writer, properties, progress=None):
 
       # write block
       writer.openFile(True)
-      writer.write("bl = lyr.addBlock({0});\n".format(pyobj2js(dem)))
-      writer.write("bl.data = [{0}];\n".format(",".join(map(gdal2threejs.formatValue, dem_values))))
+      writer.writeBlock(dem, dem_values, quantizedMesh)
       plane_index += 1
     else:
       centerQuads.addQuad(quad, dem_values)
@@ -1008,42 +1561,99 @@ def writeMultiResDEM(writer, properties, progress=None):
     dem_width = (dem_width - 1) * centerQuads.width() + 1
     dem_height = (dem_height - 1) * centerQuads.height() + 1
     dem_values = centerQuads.unitedDEM()
-    planeWidth = mapTo3d.planeWidth * extent.width() / baseExtent.width()
-    planeHeight = mapTo3d.planeHeight * extent.height() / baseExtent.height()
-    offsetX = mapTo3d.planeWidth * (extent.xMinimum() - baseExtent.xMinimum()) / baseExtent.width() + planeWidth / 2 - mapTo3d.planeWidth / 2
-    offsetY = mapTo3d.planeHeight * (extent.yMinimum() - baseExtent.yMinimum()) / baseExtent.height() + planeHeight / 2 - mapTo3d.planeHeight / 2
     dem = {"width": dem_width, "height": dem_height}
-    dem["plane"] = {"width": planeWidth, "height": planeHeight, "offsetX": offsetX, "offsetY": offsetY}
-
-    if hpw < 1:
-      image_width = context.image_basesize * centerQuads.width()
-      image_height = round(image_width * hpw)
-    else:
-      image_height = context.image_basesize * centerQuads.height()
-      image_width = round(image_height / hpw)
+    dem["plane"] = blockPlane(mapTo3d, baseExtent, extent)
 
     # display type
-    if properties.get("radioButton_MapCanvas", False):
-      dem["m"] = layer.materialManager.getMapImageIndex(image_width, image_height, extent, transparency, transp_background)
-
-    elif properties.get("radioButton_LayerImage", False):
-      dem["m"] = layer.materialManager.getLayerImageIndex(imageLayerId, image_width, image_height, extent, transparency)
-
-    elif properties.get("radioButton_SolidColor", False):
-      dem["m"] = layer.materialManager.getMeshLambertIndex(properties["lineEdit_Color"], transparency, True)
-
-    elif properties.get("radioButton_Wireframe", False):
-      dem["m"] = layer.materialManager.getWireframeIndex(properties["lineEdit_Color"], transparency)
+    image_width, image_height = blockImageSize(context, centerQuads.width(), centerQuads.height())
+    setBlockMaterial(dem, writer, layer, properties, image_width, image_height, extent)
 
     # write block
     writer.openFile(True)
-    writer.write("bl = lyr.addBlock({0});\n".format(pyobj2js(dem)))
-    writer.write("bl.data = [{0}];\n".format(",".join(map(gdal2threejs.formatValue, dem_values))))
+    writer.writeBlock(dem, dem_values, quantizedMesh)
     plane_index += 1
 
   writer.write("lyr.stats = {0};\n".format(pyobj2js(stats)))
   writer.writeMaterials(layer.materialManager)
 
+def writePyramidDEM(writer, properties, progress=None):
+  # write DEM and texture tiles of every level of a quad tree over the base extent.
+  # the root tile is written as a block of the layer and other tiles are written to separate files,
+  # which the viewer loads on demand by screen-space error.
+  context = writer.context
+  mapTo3d = context.mapTo3d
+  baseExtent = context.baseExtent
+  if progress is None:
+    progress = dummyProgress
+  prop = DEMPropertyReader(properties)
+  demlayer = QgsMapLayerRegistry.instance().mapLayer(properties["comboBox_DEMLayer"])
+  if demlayer is None:
+    return
+
+  quantizedMesh = properties.get("checkBox_QuantizedMesh", False)
+  maxLevel = min(properties.get("spinBox_PyramidLevels", 2), 4)
+
+  # layer
+  layer = DEMLayer(context, demlayer, prop)
+  lyr = {"type": "dem", "name": demlayer.name()}
+  lyr["q"] = 1    #queryable
+  writer.writeLayer(lyr)
+
+  # image size of a tile
+  image_width, image_height = blockImageSize(context)
+
+  dem_width = dem_height = 65
+  warp_dem = tools.MemoryWarpRaster(demlayer.source())
+  wkt = str(context.crs.toWkt())
+
+  stats = None
+  filetitle = os.path.splitext(writer.htmlfilename)[0]
+  files = []
+  tileCount = (4 ** (maxLevel + 1) - 1) / 3
+  tileIndex = 0
+  for level in range(maxLevel + 1):
+    count = 2 ** level
+    tile_width = baseExtent.width() / count
+    tile_height = baseExtent.height() / count
+    filenames = []
+    for y in range(count):
+      for x in range(count):
+        progress(30 * tileIndex / tileCount + 5)
+        tileIndex += 1
+
+        xmin = baseExtent.xMinimum() + tile_width * x
+        ymax = baseExtent.yMaximum() - tile_height * y
+        extent = QgsRectangle(xmin, ymax - tile_height, xmin + tile_width, ymax)
+
+        dem_values = warpBlockDEM(warp_dem, wkt, extent, dem_width, dem_height)
+        if level == 0:
+          stats = {"max": max(dem_values), "min": min(dem_values)}
+        dem_values = shiftDEMValues(dem_values, mapTo3d)
+
+        dem = {"width": dem_width, "height": dem_height}
+        dem["plane"] = blockPlane(mapTo3d, baseExtent, extent)
+
+        # display type. texture images are written into tile files
+        setBlockMaterial(dem, writer, layer, properties, image_width, image_height, extent, inlineImage=True)
+
+        # shading (whether compute normals)
+        if properties.get("checkBox_Shading", True):
+          dem["shading"] = True
+
+        if level == 0:
+          writer.writeBlock(dem, dem_values, quantizedMesh)
+          filenames.append(None)
+          continue
+
+        filename = u"{0}_t{1}_{2}_{3}.js".format(filetitle, level, x, y)
+        filenames.append(writer.writeTile(filename, level, x, y, dem, dem_values, quantizedMesh))
+    files.append(filenames)
+
+  writer.write("lyr.stats = {0};\n".format(pyobj2js(stats)))
+  writer.write("lyr.pt = {0};\n".format(pyobj2js({"levels": maxLevel, "files": files})))
+  writer.manifestLayers[-1]["tiles"] = files
+  writer.writeMaterials(layer.materialManager)
+
 class TriangleMesh:
 
   # 0 - 3
@@ -1051,45 +1661,45 @@ class TriangleMesh:
   # 1 - 2
 
   def __init__(self, xmin, ymin, xmax, ymax, x_segments, y_segments):
-    self.flen = 0
-    self.quadrangles = []
-    self.spatial_index = QgsSpatialIndex()
-
-    xres = (xmax - xmin) / x_segments
-    yres = (ymax - ymin) / y_segments
-    for y in range(y_segments):
-      for x in range(x_segments):
-        pt0 = QgsPoint(xmin + x * xres, ymax - y * yres)
-        pt1 = QgsPoint(xmin + x * xres, ymax - (y + 1) * yres)
-        pt2 = QgsPoint(xmin + (x + 1) * xres, ymax - (y + 1) * yres)
-        pt3 = QgsPoint(xmin + (x + 1) * xres, ymax - y * yres)
-        self._addQuadrangle(pt0, pt1, pt2, pt3)
-
-  def _addQuadrangle(self, pt0, pt1, pt2, pt3):
-    f = QgsFeature(self.flen)
-    f.setGeometry(QgsGeometry.fromPolygon([[pt0, pt1, pt2, pt3, pt0]]))
-    self.quadrangles.append(f)
-    self.spatial_index.insertFeature(f)
-    self.flen += 1
-
-  def intersects(self, geom):
-    for fid in self.spatial_index.intersects(geom.boundingBox()):
-      quad = self.quadrangles[fid].geometry()
-      if quad.intersects(geom):
-        yield quad
+    # the grid is regular, so cells are found by index arithmetic and
+    # their geometries are created only when needed
+    self.xmin = xmin
+    self.ymax = ymax
+    self.x_segments = x_segments
+    self.y_segments = y_segments
+    self.xres = (xmax - xmin) / x_segments
+    self.yres = (ymax - ymin) / y_segments
+
+  def quadranglePoints(self, x, y):
+    xmin, ymax, xres, yres = self.xmin, self.ymax, self.xres, self.yres
+    return [QgsPoint(xmin + x * xres, ymax - y * yres),
+            QgsPoint(xmin + x * xres, ymax - (y + 1) * yres),
+            QgsPoint(xmin + (x + 1) * xres, ymax - (y + 1) * yres),
+            QgsPoint(xmin + (x + 1) * xres, ymax - y * yres)]
 
   def splitPolygon(self, geom):
+    insideCells, boundaryCells = self.classifyCells(geom)
     polygons = []
-    for quad in self.intersects(geom):
-      pts = quad.asPolygon()[0]
+
+    # cells inside the polygon are split into two triangles
+    for x, y in insideCells:
+      pts = self.quadranglePoints(x, y)
+      polygons += [[[pts[0], pts[1], pts[3], pts[0]]], [[pts[3], pts[1], pts[2], pts[3]]]]
+
+    # cells crossed by the boundary are clipped with the polygon
+    contains, intersects = self.preparedPredicates(geom)
+    for x, y in sorted(boundaryCells, key=lambda c: (c[1], c[0])):
+      pts = self.quadranglePoints(x, y)
+      quad = QgsGeometry.fromPolygon([pts + pts[:1]])
       tris = [[[pts[0], pts[1], pts[3], pts[0]]], [[pts[3], pts[1], pts[2], pts[3]]]]
-      if geom.contains(quad):
+      if contains(quad):
         polygons += tris
-      else:
+      elif intersects(quad):
+        # exact intersection only for triangles crossed by the boundary
         for i, tri in enumerate(map(QgsGeometry.fromPolygon, tris)):
-          if geom.contains(tri):
+          if contains(tri):
             polygons.append(tris[i])
-          elif geom.intersects(tri):
+          elif intersects(tri):
             poly = geom.intersection(tri)
             if poly.isMultipart():
               polygons += poly.asMultiPolygon()
@@ -1097,6 +1707,69 @@ class TriangleMesh:
               polygons.append(poly.asPolygon())
     return polygons
 
+  def classifyCells(self, geom):
+    """ classifies cells of the grid with scanlines. returns a list of (x, y) of cells inside the polygon
+        and a set of (x, y) of cells that edges of the polygon pass through. other cells are outside. """
+    polygons = geom.asMultiPolygon() if geom.isMultipart() else [geom.asPolygon()]
+    edges = [(ring[i].x(), ring[i].y(), ring[i + 1].x(), ring[i + 1].y())
+             for polygon in polygons for ring in polygon for i in range(len(ring) - 1)]
+    return self._classifyCells(edges)
+
+  def _classifyCells(self, edges):
+    # edges: list of (x0, y0, x1, y1) of all rings
+    xmin, ymax, xres, yres = self.xmin, self.ymax, self.xres, self.yres
+    xlast, ylast = self.x_segments - 1, self.y_segments - 1
+    floor, ceil = math.floor, math.ceil
+
+    boundaryCells = set()
+    crossings = {}    # row index: list of x coordinates where edges cross the center line of the row
+    for xa, ya, xb, yb in edges:
+      ylo, yhi = min(ya, yb), max(ya, yb)
+      r0 = max(0, int(floor((ymax - yhi) / yres)))
+      r1 = min(ylast, int(floor((ymax - ylo) / yres)))
+      for r in range(r0, r1 + 1):
+        # part of the edge within the row
+        if ya == yb:
+          x0, x1 = xa, xb
+        else:
+          ta = (ymax - (r + 1) * yres - ya) / (yb - ya)
+          tb = (ymax - r * yres - ya) / (yb - ya)
+          t0, t1 = max(0.0, min(ta, tb)), min(1.0, max(ta, tb))
+          if t0 > t1:
+            continue
+          x0, x1 = xa + (xb - xa) * t0, xa + (xb - xa) * t1
+        c0 = max(0, int(floor((min(x0, x1) - xmin) / xres)))
+        c1 = min(xlast, int(floor((max(x0, x1) - xmin) / xres)))
+        for c in range(c0, c1 + 1):
+          boundaryCells.add((c, r))
+
+        # crossing with center line of the row (half-open to count a vertex on the line once)
+        yc = ymax - (r + 0.5) * yres
+        if ylo <= yc < yhi:
+          crossings.setdefault(r, []).append(xa + (xb - xa) * (yc - ya) / (yb - ya))
+
+    # cells whose centers are between pairs of crossings (even-odd rule) and that
+    # no edge passes through are inside
+    insideCells = []
+    for r, xs in crossings.iteritems():
+      xs.sort()
+      for i in range(0, len(xs) - 1, 2):
+        c0 = max(0, int(ceil((xs[i] - xmin) / xres - 0.5)))
+        c1 = min(xlast, int(ceil((xs[i + 1] - xmin) / xres - 0.5)) - 1)
+        insideCells += [(c, r) for c in range(c0, c1 + 1) if (c, r) not in boundaryCells]
+
+    return insideCells, boundaryCells
+
+  @classmethod
+  def preparedPredicates(cls, geom):
+    """ returns contains and intersects functions of the geometry. the geometry is prepared
+        if geometry engine is available (QGIS 2.10 or later) """
+    if hasattr(QgsGeometry, "createGeometryEngine"):
+      engine = QgsGeometry.createGeometryEngine(geom.geometry())
+      engine.prepareGeometry()
+      return (lambda g: engine.contains(g.geometry())), (lambda g: engine.intersects(g.geometry()))
+    return geom.contains, geom.intersects
+
   @classmethod
   def createFromContext(cls, context):
     prop = DEMPropertyReader(context.properties[ObjectTreeItem.ITEM_DEM])
@@ -1109,20 +1782,122 @@ class TriangleMesh:
     return triMesh
 
 
+class DEMGrid:
+  """ elevation grid of the primary DEM. elevation at a point is interpolated on the triangles
+      of the grid in the same way as Q3D.DEMLayer.getZ() of the viewer """
+
+  def __init__(self, values, xmin, ymin, xmax, ymax, width, height, outside_func=None):
+    self.values = values
+    self.xmin = xmin
+    self.ymin = ymin
+    self.xmax = xmax
+    self.ymax = ymax
+    self.width = width
+    self.height = height
+    self.xres = (xmax - xmin) / (width - 1)
+    self.yres = (ymax - ymin) / (height - 1)
+    self.outside_func = outside_func    # function to get elevation at a point outside the grid
+
+  def contains(self, x, y):
+    return self.xmin <= x <= self.xmax and self.ymin <= y <= self.ymax
+
+  def value(self, x, y):
+    if not self.contains(x, y):
+      return self.outside_func(x, y) if self.outside_func else 0
+
+    w = self.width
+    nx = (x - self.xmin) / self.xres
+    ny = (self.ymax - y) / self.yres
+    mx0 = min(max(int(math.floor(nx)), 0), w - 2)
+    my0 = min(max(int(math.floor(ny)), 0), self.height - 2)
+    v = self.values
+    z0, z1 = v[mx0 + w * my0], v[mx0 + 1 + w * my0]
+    z2, z3 = v[mx0 + w * (my0 + 1)], v[mx0 + 1 + w * (my0 + 1)]
+    sdx, sdy = nx - mx0, ny - my0
+    if sdx <= 1 - sdy:
+      return z0 + (z1 - z0) * sdx + (z2 - z0) * sdy
+    return z3 + (z2 - z3) * (1 - sdx) + (z1 - z3) * (1 - sdy)
+
+  def segmentize(self, xs, ys):
+    """ inserts points where a line string crosses vertical, horizontal and diagonal lines of the grid,
+        like Q3D.DEMLayer.segmentizeLineString() of the viewer. parts of the line string outside
+        the grid are not segmentized. returns a tuple of lists (xs, ys) """
+    xmin, ymax, xres, yres = self.xmin, self.ymax, self.xres, self.yres
+    nxmax, nymax = self.width - 1, self.height - 1
+    pxs, pys = [], []
+    for i in range(1, len(xs)):
+      x1, y1, x2, y2 = xs[i - 1], ys[i - 1], xs[i], ys[i]
+      nx1, nx2 = (x1 - xmin) / xres, (x2 - xmin) / xres
+      ny1, ny2 = (ymax - y1) / yres, (ymax - y2) / yres
+
+      # parameter range of the segment inside the grid (Liang-Barsky)
+      t0, t1 = 0.0, 1.0
+      for p, q in [(nx1 - nx2, nx1), (nx2 - nx1, nxmax - nx1), (ny1 - ny2, ny1), (ny2 - ny1, nymax - ny1)]:
+        if p == 0:
+          if q < 0:
+            t0, t1 = 1.0, 0.0
+            break
+        elif p < 0:
+          t0 = max(t0, float(q) / p)
+        else:
+          t1 = min(t1, float(q) / p)
+
+      p = set([0])
+      if t0 <= t1:
+        p.update([t0, t1])
+        for v1, v2 in [(nx1, nx2), (ny1, ny2), (nx1 + ny1, nx2 + ny2)]:
+          if v1 == v2:
+            continue
+          a, b = v1 + (v2 - v1) * t0, v1 + (v2 - v1) * t1
+          for k in range(int(math.ceil(min(a, b))), int(math.floor(max(a, b))) + 1):
+            p.add((k - v1) / (v2 - v1))
+
+      for t in sorted(p):
+        if t >= 1:
+          break
+        pxs.append(x1 + (x2 - x1) * t)
+        pys.append(y1 + (y2 - y1) * t)
+
+    if xs:
+      pxs.append(xs[-1])
+      pys.append(ys[-1])
+    return pxs, pys
+
+  @classmethod
+  def createFromContext(cls, context):
+    prop = DEMPropertyReader(context.properties[ObjectTreeItem.ITEM_DEM])
+    width, height = prop.width(), prop.height()
+    extent = context.baseExtent
+    # output dem should be handled as points
+    xres = extent.width() / (width - 1)
+    yres = extent.height() / (height - 1)
+    geotransform = [extent.xMinimum() - xres / 2, xres, 0, extent.yMaximum() + yres / 2, 0, -yres]
+    wkt = str(context.crs.toWkt())
+    values = context.warp_dem.read(width, height, wkt, geotransform)
+    return DEMGrid(values, extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum(), width, height,
+                   lambda x, y: context.warp_dem.readValue(wkt, x, y))
+
+
 # Geometry classes
 
-class PointGeometry:
+class PointGeometry(object):
+  """ points stored in an array of coordinates (x0, y0, z0, x1, y1, z1, ...) """
+  __slots__ = ["coords"]
+
   def __init__(self):
-    self.pts = []
+    self.coords = array("d")
+
+  def addPoints(self, xs, ys, zs):
+    GeometryUtils.extendCoords(self.coords, xs, ys, zs)
 
   def asList(self):
-    return map(lambda pt: [pt.x, pt.y, pt.z], self.pts)
+    return GeometryUtils.coordsToList(self.coords)
 
   @staticmethod
   def fromQgsGeometry(geometry, z_func, transform_func):
     geom = PointGeometry()
     pts = geometry.asMultiPoint() if geometry.isMultipart() else [geometry.asPoint()]
-    geom.pts = [transform_func(pt.x(), pt.y(), z_func(pt.x(), pt.y())) for pt in pts]
+    geom.addPoints(*GeometryUtils.transformQgsPoints(pts, z_func, transform_func))
     return geom
 
   @staticmethod
@@ -1145,22 +1920,40 @@ class PointGeometry:
         pts += [geom25d.GetPoint(i) for i in range(geom25d.GetPointCount())]
 
     point_geom = PointGeometry()
-    point_geom.pts = [transform_func(pt[0], pt[1], pt[2]) for pt in pts]
+    point_geom.addPoints(*GeometryUtils.transformTuples(pts, transform_func))
     return point_geom
 
 
-class LineGeometry:
+class LineGeometry(object):
+  """ lines stored in an array of coordinates. offsets has index of first vertex of each line
+      and total number of vertices at the end """
+  __slots__ = ["coords", "offsets"]
+
   def __init__(self):
-    self.lines = []
+    self.coords = array("d")
+    self.offsets = array("l", [0])
+
+  def addLine(self, xs, ys, zs):
+    GeometryUtils.extendCoords(self.coords, xs, ys, zs)
+    self.offsets.append(len(self.coords) // 3)
+
+  def lineCount(self):
+    return len(self.offsets) - 1
 
   def asList(self):
-    return [map(lambda pt: [pt.x, pt.y, pt.z], line) for line in self.lines]
+    o = self.offsets
+    return [GeometryUtils.coordsToList(self.coords, o[i], o[i + 1]) for i in range(len(o) - 1)]
 
   @staticmethod
-  def fromQgsGeometry(geometry, z_func, transform_func):
+  def fromQgsGeometry(geometry, z_func, transform_func, demGrid=None):
+    # lines are draped on the DEM surface if demGrid is specified
     geom = LineGeometry()
     lines = geometry.asMultiPolyline() if geometry.isMultipart() else [geometry.asPolyline()]
-    geom.lines = [[transform_func(pt.x(), pt.y(), z_func(pt.x(), pt.y())) for pt in line] for line in lines]
+    for line in lines:
+      if demGrid:
+        geom.addLine(*GeometryUtils.drapeQgsPoints(line, demGrid, transform_func))
+      else:
+        geom.addLine(*GeometryUtils.transformQgsPoints(line, z_func, transform_func))
     return geom
 
   @staticmethod
@@ -1182,38 +1975,50 @@ class LineGeometry:
       else:
         pts = [geom25d.GetPoint(i) for i in range(geom25d.GetPointCount())]
 
-      points = [transform_func(pt[0], pt[1], pt[2]) for pt in pts]
-      line_geom.lines.append(points)
+      line_geom.addLine(*GeometryUtils.transformTuples(pts, transform_func))
 
     return line_geom
 
 
-class PolygonGeometry:
+class PolygonGeometry(object):
+  """ polygons stored in an array of coordinates. ringOffsets has index of first vertex of each ring
+      and polygonOffsets has index of first ring of each polygon, and both have total count at the end.
+      outer boundaries are clockwise and inner boundaries are counter-clockwise. """
+  __slots__ = ["coords", "ringOffsets", "polygonOffsets", "centroids", "split_polygons", "borders"]
+
   def __init__(self):
-    self.polygons = []
-    self.centroids = []
-    self.split_polygons = []
+    self.coords = array("d")
+    self.ringOffsets = array("l", [0])
+    self.polygonOffsets = array("l", [0])
+    self.centroids = array("d")
+    self.split_polygons = None    # PolygonGeometry of polygons split for overlay
+    self.borders = None           # LineGeometry of boundaries draped on the DEM surface
+
+  def addPolygon(self, rings):
+    """ rings: list of (xs, ys, zs). first one is outer boundary """
+    for i, (xs, ys, zs) in enumerate(rings):
+      if GeometryUtils.isClockwise(xs, ys) == (i != 0):
+        xs, ys, zs = xs[::-1], ys[::-1], zs[::-1]   # outer to clockwise, inner to counter-clockwise
+      GeometryUtils.extendCoords(self.coords, xs, ys, zs)
+      self.ringOffsets.append(len(self.coords) // 3)
+    self.polygonOffsets.append(len(self.ringOffsets) - 1)
+
+  def polygonCount(self):
+    return len(self.polygonOffsets) - 1
+
+  def rings(self, index):
+    """ returns rings of a polygon as lists of [x, y, z] """
+    ro, po = self.ringOffsets, self.polygonOffsets
+    return [GeometryUtils.coordsToList(self.coords, ro[i], ro[i + 1]) for i in range(po[index], po[index + 1])]
 
   def asList(self):
-    p = []
-    for boundaries in self.polygons:
-      # outer boundary
-      pts = map(lambda pt: [pt.x, pt.y, pt.z], boundaries[0])
-      if not GeometryUtils.isClockwise(boundary):
-        pts.reverse()   # to clockwise
-      b = [pts]
-
-      # inner boundaries
-      for boundary in boundaries[1:]:
-        pts = map(lambda pt: [pt.x, pt.y, pt.z], boundary)
-        if GeometryUtils.isClockwise(boundary):
-          pts.reverse()   # to counter-clockwise
-        b.append(pts)
-      p.append(b)
-    return p
+    return [self.rings(i) for i in range(self.polygonCount())]
+
+  def centroidList(self):
+    return GeometryUtils.coordsToList(self.centroids)
 
   @staticmethod
-  def fromQgsGeometry(geometry, z_func, transform_func, calcCentroid=False, triMesh=None):
+  def fromQgsGeometry(geometry, z_func, transform_func, calcCentroid=False, triMesh=None, demGrid=None):
 
     useCentroidHeight = True
     centroidPerPolygon = True
@@ -1223,57 +2028,34 @@ class PolygonGeometry:
     if calcCentroid and not centroidPerPolygon:
       pt = geometry.centroid().asPoint()
       centroidHeight = z_func(pt.x(), pt.y())
-      geom.centroids.append(transform_func(pt.x(), pt.y(), centroidHeight))
+      GeometryUtils.extendCoords(geom.centroids, *transform_func([pt.x()], [pt.y()], [centroidHeight]))
 
     for polygon in polygons:
       if useCentroidHeight or calcCentroid:
         pt = QgsGeometry.fromPolygon(polygon).centroid().asPoint()
         centroidHeight = z_func(pt.x(), pt.y())
         if calcCentroid and centroidPerPolygon:
-          geom.centroids.append(transform_func(pt.x(), pt.y(), centroidHeight))
+          GeometryUtils.extendCoords(geom.centroids, *transform_func([pt.x()], [pt.y()], [centroidHeight]))
 
       if useCentroidHeight:
         z_func = lambda x, y: centroidHeight
 
-      boundaries = []
-      # outer boundary
-      points = []
-      for pt in polygon[0]:
-        points.append(transform_func(pt.x(), pt.y(), z_func(pt.x(), pt.y())))
-
-      if not GeometryUtils.isClockwise(points):
-        points.reverse()    # to clockwise
-      boundaries.append(points)
+      geom.addPolygon([GeometryUtils.transformQgsPoints(boundary, z_func, transform_func) for boundary in polygon])
 
-      # inner boundaries
-      for boundary in polygon[1:]:
-        points = [transform_func(pt.x(), pt.y(), z_func(pt.x(), pt.y())) for pt in boundary]
-        if GeometryUtils.isClockwise(points):
-          points.reverse()    # to counter-clockwise
-        boundaries.append(points)
-
-      geom.polygons.append(boundaries)
+    if demGrid:
+      # boundaries draped on the DEM surface (borders of overlay)
+      geom.borders = LineGeometry()
+      for polygon in polygons:
+        for boundary in polygon:
+          geom.borders.addLine(*GeometryUtils.drapeQgsPoints(boundary, demGrid, transform_func))
 
     if triMesh is None:
       return geom
 
     # split polygon for overlay
+    geom.split_polygons = PolygonGeometry()
     for polygon in triMesh.splitPolygon(geometry):
-      boundaries = []
-      # outer boundary
-      points = [transform_func(pt.x(), pt.y(), 0) for pt in polygon[0]]
-      if not GeometryUtils.isClockwise(points):
-        points.reverse()    # to clockwise
-      boundaries.append(points)
-
-      # inner boundaries
-      for boundary in polygon[1:]:
-        points = [transform_func(pt.x(), pt.y(), 0) for pt in boundary]
-        if GeometryUtils.isClockwise(points):
-          points.reverse()    # to counter-clockwise
-        boundaries.append(points)
-
-      geom.split_polygons.append(boundaries)
+      geom.split_polygons.addPolygon([GeometryUtils.transformQgsPoints(boundary, None, transform_func) for boundary in polygon])
 
     return geom
 
@@ -1294,6 +2076,7 @@ class Feature:
     self.geomType = layer.geomType
     self.geomClass = layer.geomClass
     self.hasLabel = layer.hasLabel
+    self.simplifyTolerance = layer.simplifyTolerance
 
     self.feat = None
     self.geom = None
@@ -1310,9 +2093,27 @@ class Feature:
     # coordinate transformation - layer crs to project crs
     geom.transform(self.transform)
 
+    # simplify geometry (topology is preserved)
+    if self.simplifyTolerance and not self.prop.useZ():
+      simplified = geom.simplify(self.simplifyTolerance)
+      if simplified and not simplified.isGeosEmpty():
+        geom = simplified
+
     # clip geometry
     if clipGeom and self.geomType in [QGis.Line, QGis.Polygon]:
-      geom = geom.intersection(clipGeom)
+      clipRect = clipGeom.boundingBox()   # clip geometry is a rectangle
+      bbox = geom.boundingBox()
+      if not clipRect.contains(bbox):
+        if not clipRect.intersects(bbox):
+          qDebug("geometry outside clip extent skipped")
+          return
+
+        # lines and polygons whose rings don't cross the rectangle are clipped without GEOS.
+        # the fast path creates 2D points, so geometries with z values are clipped by GEOS.
+        clipped = None if self.prop.useZ() else GeometryUtils.clipToRect(geom, clipRect)
+        if clipped is None:
+          clipped = geom.intersection(clipGeom)
+        geom = clipped
 
     # check if geometry is empty
     if geom.isGeosEmpty():
@@ -1326,19 +2127,34 @@ class Feature:
     else:
       z_func = lambda x, y: 0
 
-    # transform_func: function to transform the map coordinates to 3d coordinates
+    # transform_func: function to transform lists of map coordinates to lists of 3d coordinates
     relativeHeight = self.prop.relativeHeight(feat)
-    def transform_func(x, y, z):
-      return self.context.mapTo3d.transform(x, y, z + relativeHeight)
+    mapTo3d = self.context.mapTo3d
+    quantizer = self.context.quantizer
+    if quantizer is None:
+      def transform_func(xs, ys, zs):
+        return mapTo3d.transformArrays(xs, ys, zs, relativeHeight)
+    else:
+      def transform_func(xs, ys, zs):
+        return quantizer.quantizeArrays(*mapTo3d.transformArrays(xs, ys, zs, relativeHeight))
+
+    # drape lines and borders of overlay polygons on the DEM surface
+    demGrid = None
+    if self.prop.properties.get("checkBox_Drape", False) and self.prop.isHeightRelativeToDEM():
+      demGrid = self.context.demGrid()
 
     if self.geomType == QGis.Polygon:
       triMesh = None
       if self.prop.type_index == 1 and self.prop.isHeightRelativeToDEM():   # Overlay
         z_func = lambda x, y: 0
         triMesh = self.context.triangleMesh()
-      self.geom = self.geomClass.fromQgsGeometry(geom, z_func, transform_func, self.hasLabel, triMesh)
+      else:
+        demGrid = None
+      self.geom = self.geomClass.fromQgsGeometry(geom, z_func, transform_func, self.hasLabel, triMesh, demGrid)
     elif self.prop.useZ():
       self.geom = self.geomClass.fromWkb25D(geom.asWkb(), transform_func)
+    elif self.geomType == QGis.Line:
+      self.geom = self.geomClass.fromQgsGeometry(geom, z_func, transform_func, demGrid)
     else:
       self.geom = self.geomClass.fromQgsGeometry(geom, z_func, transform_func)
 
@@ -1382,6 +2198,14 @@ class VectorLayer(Layer):
     self.geomClass = self.geomType2Class.get(self.geomType)
     self.hasLabel = prop.properties.get("checkBox_ExportAttrs", False) and prop.properties.get("comboBox_Label") is not None
 
+    # tolerance of simplification in map units. default is size of a map canvas pixel
+    self.simplifyTolerance = None
+    if self.geomType in [QGis.Line, QGis.Polygon] and prop.properties.get("checkBox_Simplify", False):
+      try:
+        self.simplifyTolerance = float(prop.properties.get("lineEdit_SimplifyTolerance", ""))
+      except ValueError:
+        self.simplifyTolerance = context.canvas.mapUnitsPerPixel()
+
 
 def writeVectors(writer, progress=None):
   context = writer.context
@@ -1429,6 +2253,9 @@ def writeVectors(writer, progress=None):
     if geom_type == QGis.Polygon and prop.type_index == 1:   # Overlay
       lyr["am"] = "relative" if prop.isHeightRelativeToDEM() else "absolute"    # altitude mode
 
+    if context.quantizer:
+      lyr["dq"] = context.quantizer.params()    # dequantization parameters
+
     # make list of field names
     writeAttrs = properties.get("checkBox_ExportAttrs", False)
     fieldNames = None
@@ -1452,6 +2279,10 @@ def writeVectors(writer, progress=None):
     mapLayer.rendererV2().startRender(renderer.rendererContext(), mapLayer.pendingFields() if apiChanged23 else mapLayer)
 
     request = QgsFeatureRequest()
+    # fetch only attributes that are needed. all attributes are needed to export them
+    if not writeAttrs:
+      request.setSubsetOfAttributes(prop.usedFieldNames(), mapLayer.pendingFields())
+
     # features to export
     clipGeom = None
     if properties.get("radioButton_IntersectingFeatures", False):
@@ -1472,11 +2303,12 @@ def writeVectors(writer, progress=None):
                                            #      obj_mod.feature(writer, layer, feat)
       # stack attributes in writer
       if writeAttrs:
-        writer.addAttributes(f.attributes())
+        writer.addAttributes(list(f.attributes()))
 
     # write attributes
     if writeAttrs:
-      writer.writeAttributes()
+      # label needs attributes when the layer is built
+      writer.writeAttributes(properties.get("checkBox_AttrsOnDemand", False) and not hasLabel)
 
     # write materials
     writer.writeMaterials(layer.materialManager)
@@ -1527,39 +2359,134 @@ def writeSphereTexture(writer):
 class GeometryUtils:
 
   @classmethod
-  def _signedArea(cls, p):
+  def _signedArea(cls, xs, ys):
     """Calculates signed area of polygon."""
     area = 0
-    for i in range(len(p) - 1):
-      area += (p[i].x - p[i + 1].x) * (p[i].y + p[i + 1].y)
-    return area / 2
+    for i in range(len(xs) - 1):
+      area += (xs[i] - xs[i + 1]) * (ys[i] + ys[i + 1])
+    return area / 2.0
 
   @classmethod
-  def isClockwise(cls, linearRing):
+  def isClockwise(cls, xs, ys):
     """Returns whether given linear ring is clockwise."""
-    return cls._signedArea(linearRing) < 0
+    return cls._signedArea(xs, ys) < 0
+
+  @classmethod
+  def extendCoords(cls, coords, xs, ys, zs):
+    """Appends coordinates to an array of interleaved coordinates (x0, y0, z0, x1, ...)."""
+    c = [0] * (3 * len(xs))
+    c[0::3] = xs
+    c[1::3] = ys
+    c[2::3] = zs
+    coords.extend(c)
+
+  @classmethod
+  def coordsToList(cls, coords, start=0, end=None):
+    """Returns a list of [x, y, z] of vertices from start to end (exclusive) in an array of coordinates."""
+    it = iter(coords[3 * start:None if end is None else 3 * end])
+    return map(list, zip(it, it, it))
+
+  @classmethod
+  def transformQgsPoints(cls, pts, z_func, transform_func):
+    """Transforms a list of QgsPoints with a function that transforms lists of coordinates
+       and returns a tuple of lists (xs, ys, zs). z coordinates are given by z_func, or zero if z_func is None."""
+    xs = [pt.x() for pt in pts]
+    ys = [pt.y() for pt in pts]
+    zs = [0] * len(pts) if z_func is None else map(z_func, xs, ys)
+    return transform_func(xs, ys, zs)
+
+  @classmethod
+  def clipToRect(cls, geom, rect):
+    """Clips a line or polygon geometry with a rectangle. Returns None if geometry type is not supported
+       or a polygon ring crosses the rectangle, in which case the geometry should be clipped by GEOS."""
+    bounds = (rect.xMinimum(), rect.yMinimum(), rect.xMaximum(), rect.yMaximum())
+    geomType = geom.type()
+    if geomType == QGis.Line:
+      lines = geom.asMultiPolyline() if geom.isMultipart() else [geom.asPolyline()]
+      parts = []
+      for line in lines:
+        parts += cls.clipPolyline(line, *bounds)
+      return QgsGeometry.fromMultiPolyline(parts)
+
+    if geomType == QGis.Polygon:
+      polygons = geom.asMultiPolygon() if geom.isMultipart() else [geom.asPolygon()]
+      parts = []
+      for polygon in polygons:
+        if not polygon:
+          continue
+        # polygons inside the rectangle are kept and ones outside it are dropped
+        xs, ys = [pt.x() for pt in polygon[0]], [pt.y() for pt in polygon[0]]
+        if bounds[0] <= min(xs) and max(xs) <= bounds[2] and bounds[1] <= min(ys) and max(ys) <= bounds[3]:
+          parts.append(polygon)
+        elif not (max(xs) < bounds[0] or bounds[2] < min(xs) or max(ys) < bounds[1] or bounds[3] < min(ys)):
+          return None
+      return QgsGeometry.fromMultiPolygon(parts)
+
+    return None
+
+  @classmethod
+  def clipPolyline(cls, pts, xmin, ymin, xmax, ymax):
+    """Clips a polyline (list of QgsPoints) with a rectangle by Liang-Barsky algorithm.
+       Returns a list of polylines inside the rectangle."""
+    parts = []
+    current = []
+    for i in range(len(pts) - 1):
+      x0, y0, x1, y1 = pts[i].x(), pts[i].y(), pts[i + 1].x(), pts[i + 1].y()
+      dx, dy = x1 - x0, y1 - y0
+      t0, t1 = 0.0, 1.0
+      for p, q in [(-dx, x0 - xmin), (dx, xmax - x0), (-dy, y0 - ymin), (dy, ymax - y0)]:
+        if p == 0:
+          if q < 0:
+            t0, t1 = 1.0, 0.0   # parallel to and outside the edge
+            break
+        else:
+          t = float(q) / p
+          if p < 0:
+            t0 = max(t0, t)
+          else:
+            t1 = min(t1, t)
+      if t0 > t1:
+        if current:
+          parts.append(current)
+          current = []
+        continue
+
+      if current and t0 > 0:
+        parts.append(current)
+        current = []
+      if not current:
+        current = [QgsPoint(x0 + dx * t0, y0 + dy * t0)]
+      current.append(QgsPoint(x0 + dx * t1, y0 + dy * t1))
+      if t1 < 1:
+        parts.append(current)
+        current = []
+
+    if current:
+      parts.append(current)
+    return [part for part in parts if len(part) > 1]
+
+  @classmethod
+  def drapeQgsPoints(cls, pts, demGrid, transform_func):
+    """Segmentizes a list of QgsPoints at the grid lines of the DEM and transforms it with
+       elevations interpolated on the DEM surface."""
+    xs, ys = demGrid.segmentize([pt.x() for pt in pts], [pt.y() for pt in pts])
+    return transform_func(xs, ys, map(demGrid.value, xs, ys))
+
+  @classmethod
+  def transformTuples(cls, pts, transform_func):
+    """Transforms a list of (x, y, z) tuples with a function that transforms lists of coordinates."""
+    if not pts:
+      return [], [], []
+    return transform_func(*zip(*pts))
+
 
+_encoders = {}
 
 def pyobj2js(obj, escape=False, quoteHex=True):
-  if isinstance(obj, dict):
-    items = [u"{0}:{1}".format(k, pyobj2js(v, escape, quoteHex)) for k, v in obj.iteritems()]
-    return "{" + ",".join(items) + "}"
-  elif isinstance(obj, list):
-    items = [unicode(pyobj2js(v, escape, quoteHex)) for v in obj]
-    return "[" + ",".join(items) + "]"
-  elif isinstance(obj, bool):
-    return "true" if obj else "false"
-  elif isinstance(obj, (str, unicode)):
-    if escape:
-      return '"' + obj.replace("\\", "\\\\").replace('"', '\\"') + '"'
-    if not quoteHex and re.match("0x[0-9A-Fa-f]+$", obj):
-      return obj
-    return '"' + obj + '"'
-  elif isinstance(obj, (int, float)):
-    return obj
-  elif obj == NULL:   # qgis.core.NULL
-    return "null"
-  return '"' + str(obj) + '"'
+  encoder = _encoders.get((escape, quoteHex))
+  if encoder is None:
+    encoder = _encoders[(escape, quoteHex)] = JSEncoder(escape, quoteHex, null=NULL)
+  return encoder.encode(obj)
 
 # createQuadTree(extent, demProperties)
 def createQuadTree(extent, p):
@@ -24,9 +24,12 @@ from PyQt4.QtGui import QMessageBox
 import sys
 import os
 import ConfigParser
+import hashlib
 import shutil
 import struct
+import tempfile
 import webbrowser
+import zipfile
 
 try:
   from osgeo import gdal
@@ -225,6 +228,155 @@ def copyThreejsFiles(out_dir, controls, overwrite=False):
   # copy controls file
   copyFile(os.path.join(threejs_dir, "controls", controls), os.path.join(target_dir, controls), overwrite)
 
+class ZipBundle:
+  """ writes output files into a zip archive. entries are stored in the order they are added """
+
+  def __init__(self, filename):
+    self.filename = filename
+    self.zip = zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+    self.names = set()
+    self.entries = []     # entries that have not been closed yet
+
+  def open(self, arcname):
+    # returns a file-like object. its data is written to a temporary file and
+    # the file is added to the archive when it is closed.
+    entry = ZipBundleEntry(self, arcname)
+    self.entries.append(entry)
+    return entry
+
+  def writeData(self, arcname, data):
+    if arcname in self.names:
+      return False
+    self.names.add(arcname)
+    self.zip.writestr(arcname, data)
+    return True
+
+  def addFile(self, path, arcname):
+    # library files are added only once even if two or more directories contain them
+    if arcname in self.names:
+      if debug_mode:
+        qDebug("File already in bundle: %s" % arcname)
+      return False
+    self.names.add(arcname)
+    self.zip.write(path, arcname)
+    return True
+
+  def addDir(self, dirpath, arcname):
+    for root, dirs, files in os.walk(dirpath):
+      for filename in files:
+        path = os.path.join(root, filename)
+        self.addFile(path, os.path.join(arcname, os.path.relpath(path, dirpath)).replace(os.sep, "/"))
+
+  def close(self):
+    if self.zip is None:
+      return
+    # entries left open (export has been aborted) are discarded
+    for entry in self.entries[:]:
+      entry.discard()
+    self.zip.close()
+    self.zip = None
+
+
+class ZipBundleEntry:
+  """ file-like object for an entry of zip bundle. data is not kept in memory but written
+      to a temporary file next to the archive, which is compressed into the archive on close. """
+
+  def __init__(self, bundle, arcname):
+    self.bundle = bundle
+    self.name = arcname
+    fd, self.tempPath = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(bundle.filename)))
+    self.file = os.fdopen(fd, "wb")
+
+  def write(self, data):
+    self.file.write(data)
+
+  def seek(self, offset, whence=0):
+    self.file.seek(offset, whence)
+
+  def close(self):
+    if self.file is None:
+      return
+    self.file.close()
+    self.file = None
+    self.bundle.entries.remove(self)
+    try:
+      self.bundle.addFile(self.tempPath, self.name)
+    finally:
+      os.remove(self.tempPath)
+
+  def discard(self):
+    # removes the temporary file without adding it to the archive
+    if self.file is None:
+      return
+    self.file.close()
+    self.file = None
+    self.bundle.entries.remove(self)
+    os.remove(self.tempPath)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+
+class HashedFile:
+  """ file-like object that renames the file to <hash of content><ext> when it is closed.
+      name is the file name after the file has been closed. """
+
+  def __init__(self, f):
+    self.f = f    # file object opened in binary mode or ZipBundleEntry object
+    self.name = f.name
+    self.md5 = hashlib.md5()
+
+  def write(self, data):
+    self.md5.update(data)
+    self.f.write(data)
+
+  def close(self):
+    if self.f is None:
+      return
+    dirname, filename = os.path.split(self.name)
+    hashedName = os.path.join(dirname, self.md5.hexdigest()[:16] + os.path.splitext(filename)[1])
+    if isinstance(self.f, ZipBundleEntry):
+      self.f.name = hashedName
+      self.f.close()
+    else:
+      self.f.close()
+      if os.path.exists(hashedName):
+        os.remove(hashedName)   # a file with the same content
+      os.rename(self.name, hashedName)
+    self.name = hashedName
+    self.f = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+
+def bundleLibraries(bundle, config, controls, proj4js=False):
+  # add library files to bundle in the same layout as copyThreejsFiles(), copyProj4js() and copyLibraries()
+  plugin_dir = pluginDir()
+  threejs_dir = plugin_dir + "/js/threejs"
+  for filename in QDir(threejs_dir).entryList(QDir.Files):
+    bundle.addFile(os.path.join(threejs_dir, filename), "threejs/" + filename)
+  bundle.addFile(os.path.join(threejs_dir, "controls", controls), "threejs/" + controls)
+
+  if proj4js:
+    bundle.addDir(os.path.join(plugin_dir, "js/proj4js"), "proj4js")
+
+  files = config.get("files", "").strip()
+  if files:
+    for f in files.split(","):
+      bundle.addFile(os.path.join(plugin_dir, f), os.path.basename(f))
+
+  dirs = config.get("dirs", "").strip()
+  if dirs:
+    for d in dirs.split(","):
+      bundle.addDir(os.path.join(plugin_dir, d), os.path.basename(d))
+
 def removeTemporaryFiles(filelist):
   for file in filelist:
     QFile.remove(file)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ Qgis2threejs
+                                 A QGIS plugin
+ export terrain data, map canvas image and vector data to web browser
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 Qgis2threejs contributors
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+# Encoding of DEM blocks modeled on the quantized-mesh terrain format.
+#  - heights of vertices are quantized to 0-32767 and zig-zag delta encoded
+#  - vertex positions, triangles and edge vertices of a regular grid are implied by
+#    width and height of the block, so they are restored by the viewer and not written
+
+MAX_VALUE = 32767
+
+
+def zigZagDeltas(values):
+  deltas = []
+  prev = 0
+  for v in values:
+    d = v - prev
+    deltas.append(d << 1 if d >= 0 else ((-d) << 1) - 1)
+    prev = v
+  return deltas
+
+
+def encodeGrid(width, height, values):
+  """encode a grid of elevation values (row-major, north to south) into a dict for the viewer.
+
+  the viewer builds the mesh with THREE.PlaneGeometry and sets the decoded heights to its vertices.
+  """
+  zmin = min(values)
+  zmax = max(values)
+  zrange = zmax - zmin
+  hscale = float(MAX_VALUE) / zrange if zrange else 0
+
+  hs = [int(round((v - zmin) * hscale)) for v in values]
+  return {"min": zmin,
+          "max": zmax,
+          "h": zigZagDeltas(hs)}
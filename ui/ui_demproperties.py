@@ -232,6 +232,27 @@ class Ui_DEMPropertiesWidget(object):
         self.lineEdit_ymin.setObjectName(_fromUtf8("lineEdit_ymin"))
         self.horizontalLayout_Advanced4.addWidget(self.lineEdit_ymin)
         self.verticalLayout_Advanced.addLayout(self.horizontalLayout_Advanced4)
+        self.checkBox_QuantizedMesh = QtGui.QCheckBox(DEMPropertiesWidget)
+        self.checkBox_QuantizedMesh.setObjectName(_fromUtf8("checkBox_QuantizedMesh"))
+        self.verticalLayout_Advanced.addWidget(self.checkBox_QuantizedMesh)
+        self.horizontalLayout_Pyramid = QtGui.QHBoxLayout()
+        self.horizontalLayout_Pyramid.setObjectName(_fromUtf8("horizontalLayout_Pyramid"))
+        self.checkBox_Pyramid = QtGui.QCheckBox(DEMPropertiesWidget)
+        self.checkBox_Pyramid.setObjectName(_fromUtf8("checkBox_Pyramid"))
+        self.horizontalLayout_Pyramid.addWidget(self.checkBox_Pyramid)
+        self.label_PyramidLevels = QtGui.QLabel(DEMPropertiesWidget)
+        self.label_PyramidLevels.setObjectName(_fromUtf8("label_PyramidLevels"))
+        self.horizontalLayout_Pyramid.addWidget(self.label_PyramidLevels)
+        self.spinBox_PyramidLevels = QtGui.QSpinBox(DEMPropertiesWidget)
+        self.spinBox_PyramidLevels.setMinimum(1)
+        self.spinBox_PyramidLevels.setMaximum(4)
+        self.spinBox_PyramidLevels.setProperty("value", 2)
+        self.spinBox_PyramidLevels.setObjectName(_fromUtf8("spinBox_PyramidLevels"))
+        self.horizontalLayout_Pyramid.addWidget(self.spinBox_PyramidLevels)
+        self.verticalLayout_Advanced.addLayout(self.horizontalLayout_Pyramid)
+        self.checkBox_TextureAtlas = QtGui.QCheckBox(DEMPropertiesWidget)
+        self.checkBox_TextureAtlas.setObjectName(_fromUtf8("checkBox_TextureAtlas"))
+        self.verticalLayout_Advanced.addWidget(self.checkBox_TextureAtlas)
         self.verticalLayout_6.addLayout(self.verticalLayout_Advanced)
         self.verticalLayout_2.addWidget(self.groupBox_Resampling)
         self.groupBox_DisplayType = QtGui.QGroupBox(DEMPropertiesWidget)
@@ -368,6 +389,14 @@ class Ui_DEMPropertiesWidget(object):
         self.label_ymax.setText(_translate("DEMPropertiesWidget", "y", None))
         self.label_xmin.setText(_translate("DEMPropertiesWidget", "xmin", None))
         self.label_ymin.setText(_translate("DEMPropertiesWidget", "ymin", None))
+        self.checkBox_QuantizedMesh.setToolTip(_translate("DEMPropertiesWidget", "Write elevation values of blocks as zig-zag delta encoded 16-bit integers", None))
+        self.checkBox_QuantizedMesh.setText(_translate("DEMPropertiesWidget", "Quantized-mesh encoding", None))
+        self.checkBox_Pyramid.setToolTip(_translate("DEMPropertiesWidget", "Write tiles of every level of the quad tree over the whole extent. The viewer loads tiles as the camera moves.", None))
+        self.checkBox_Pyramid.setText(_translate("DEMPropertiesWidget", "Tile pyramid (load tiles on demand)", None))
+        self.label_PyramidLevels.setText(_translate("DEMPropertiesWidget", "Levels", None))
+        self.spinBox_PyramidLevels.setToolTip(_translate("DEMPropertiesWidget", "Number of levels below the root tile. Level n has 4^n tiles.", None))
+        self.checkBox_TextureAtlas.setToolTip(_translate("DEMPropertiesWidget", "Pack textures of the blocks of each level into an atlas image to reduce images and materials (map canvas and layer image display types)", None))
+        self.checkBox_TextureAtlas.setText(_translate("DEMPropertiesWidget", "Texture atlas per level", None))
         self.groupBox_DisplayType.setTitle(_translate("DEMPropertiesWidget", "Display type", None))
         self.radioButton_MapCanvas.setText(_translate("DEMPropertiesWidget", "Map canvas image", None))
         self.checkBox_TransparentBackground.setText(_translate("DEMPropertiesWidget", "Transparent background", None))
@@ -65,6 +65,9 @@ class Ui_VectorPropertiesWidget(object):
         self.verticalLayout_zCoordinate = QtGui.QVBoxLayout()
         self.verticalLayout_zCoordinate.setObjectName(_fromUtf8("verticalLayout_zCoordinate"))
         self.gridLayout_9.addLayout(self.verticalLayout_zCoordinate, 1, 0, 1, 1)
+        self.checkBox_Drape = QtGui.QCheckBox(self.groupBox_zCoordinate)
+        self.checkBox_Drape.setObjectName(_fromUtf8("checkBox_Drape"))
+        self.gridLayout_9.addWidget(self.checkBox_Drape, 2, 0, 1, 1)
         self.verticalLayout_2.addWidget(self.groupBox_zCoordinate)
         self.groupBox_Styles = QtGui.QGroupBox(VectorPropertiesWidget)
         sizePolicy = QtGui.QSizePolicy(QtGui.QSizePolicy.Preferred, QtGui.QSizePolicy.Preferred)
@@ -101,6 +104,16 @@ class Ui_VectorPropertiesWidget(object):
         self.checkBox_Clip.setObjectName(_fromUtf8("checkBox_Clip"))
         self.verticalLayout_Feature.addWidget(self.checkBox_Clip)
         self.verticalLayout_3.addLayout(self.verticalLayout_Feature)
+        self.horizontalLayout_Simplify = QtGui.QHBoxLayout()
+        self.horizontalLayout_Simplify.setObjectName(_fromUtf8("horizontalLayout_Simplify"))
+        self.checkBox_Simplify = QtGui.QCheckBox(self.groupBox_Features)
+        self.checkBox_Simplify.setObjectName(_fromUtf8("checkBox_Simplify"))
+        self.horizontalLayout_Simplify.addWidget(self.checkBox_Simplify)
+        self.lineEdit_SimplifyTolerance = QtGui.QLineEdit(self.groupBox_Features)
+        self.lineEdit_SimplifyTolerance.setEnabled(False)
+        self.lineEdit_SimplifyTolerance.setObjectName(_fromUtf8("lineEdit_SimplifyTolerance"))
+        self.horizontalLayout_Simplify.addWidget(self.lineEdit_SimplifyTolerance)
+        self.verticalLayout_3.addLayout(self.horizontalLayout_Simplify)
         self.verticalLayout_2.addWidget(self.groupBox_Features)
         self.groupBox_Attrs = QtGui.QGroupBox(VectorPropertiesWidget)
         self.groupBox_Attrs.setObjectName(_fromUtf8("groupBox_Attrs"))
@@ -111,6 +124,10 @@ class Ui_VectorPropertiesWidget(object):
         self.checkBox_ExportAttrs.setChecked(False)
         self.checkBox_ExportAttrs.setObjectName(_fromUtf8("checkBox_ExportAttrs"))
         self.verticalLayout_4.addWidget(self.checkBox_ExportAttrs)
+        self.checkBox_AttrsOnDemand = QtGui.QCheckBox(self.groupBox_Attrs)
+        self.checkBox_AttrsOnDemand.setEnabled(False)
+        self.checkBox_AttrsOnDemand.setObjectName(_fromUtf8("checkBox_AttrsOnDemand"))
+        self.verticalLayout_4.addWidget(self.checkBox_AttrsOnDemand)
         self.formLayout_Label = QtGui.QFormLayout()
         self.formLayout_Label.setContentsMargins(2, -1, 2, -1)
         self.formLayout_Label.setObjectName(_fromUtf8("formLayout_Label"))
@@ -150,7 +167,15 @@ class Ui_VectorPropertiesWidget(object):
         self.radioButton_AllFeatures.setText(_translate("VectorPropertiesWidget", "All features", None))
         self.radioButton_IntersectingFeatures.setText(_translate("VectorPropertiesWidget", "Features that intersect with map canvas extent", None))
         self.checkBox_Clip.setText(_translate("VectorPropertiesWidget", "Clip geometries", None))
+        self.checkBox_Simplify.setToolTip(_translate("VectorPropertiesWidget", "Simplify geometries of lines and polygons (preserving topology) before export", None))
+        self.checkBox_Simplify.setText(_translate("VectorPropertiesWidget", "Simplify geometries", None))
+        self.lineEdit_SimplifyTolerance.setToolTip(_translate("VectorPropertiesWidget", "Tolerance in map units. If empty, map units per pixel of map canvas is used.", None))
+        self.lineEdit_SimplifyTolerance.setPlaceholderText(_translate("VectorPropertiesWidget", "Auto", None))
+        self.checkBox_Drape.setToolTip(_translate("VectorPropertiesWidget", "Insert vertices where lines cross the DEM grid and interpolate their elevations on the DEM surface. Applies to lines and borders of overlay polygons whose height is relative to DEM, in simple resampling mode only.", None))
+        self.checkBox_Drape.setText(_translate("VectorPropertiesWidget", "Drape on DEM surface", None))
         self.groupBox_Attrs.setTitle(_translate("VectorPropertiesWidget", "Attribute and label", None))
         self.checkBox_ExportAttrs.setText(_translate("VectorPropertiesWidget", "Export attributes", None))
+        self.checkBox_AttrsOnDemand.setToolTip(_translate("VectorPropertiesWidget", "Write attributes into separate files that are loaded when a feature is clicked. Ignored if label is exported.", None))
+        self.checkBox_AttrsOnDemand.setText(_translate("VectorPropertiesWidget", "Load attributes on demand", None))
         self.label.setText(_translate("VectorPropertiesWidget", "Label field", None))
 
@@ -26,11 +26,48 @@ except AttributeError:
 class Ui_WorldPropertiesWidget(object):
     def setupUi(self, WorldPropertiesWidget):
         WorldPropertiesWidget.setObjectName(_fromUtf8("WorldPropertiesWidget"))
-        WorldPropertiesWidget.resize(286, 366)
+        WorldPropertiesWidget.resize(286, 518)
         self.gridLayout = QtGui.QGridLayout(WorldPropertiesWidget)
         self.gridLayout.setObjectName(_fromUtf8("gridLayout"))
         spacerItem = QtGui.QSpacerItem(20, 40, QtGui.QSizePolicy.Minimum, QtGui.QSizePolicy.Expanding)
-        self.gridLayout.addItem(spacerItem, 5, 0, 1, 1)
+        self.gridLayout.addItem(spacerItem, 6, 0, 1, 1)
+        self.groupBox_Output = QtGui.QGroupBox(WorldPropertiesWidget)
+        self.groupBox_Output.setObjectName(_fromUtf8("groupBox_Output"))
+        self.formLayout_Output = QtGui.QFormLayout(self.groupBox_Output)
+        self.formLayout_Output.setFieldGrowthPolicy(QtGui.QFormLayout.AllNonFixedFieldsGrow)
+        self.formLayout_Output.setObjectName(_fromUtf8("formLayout_Output"))
+        self.label_MaxFileSize = QtGui.QLabel(self.groupBox_Output)
+        self.label_MaxFileSize.setObjectName(_fromUtf8("label_MaxFileSize"))
+        self.formLayout_Output.setWidget(0, QtGui.QFormLayout.LabelRole, self.label_MaxFileSize)
+        self.spinBox_MaxFileSize = QtGui.QSpinBox(self.groupBox_Output)
+        self.spinBox_MaxFileSize.setMaximum(1000000)
+        self.spinBox_MaxFileSize.setSingleStep(256)
+        self.spinBox_MaxFileSize.setProperty("value", 0)
+        self.spinBox_MaxFileSize.setObjectName(_fromUtf8("spinBox_MaxFileSize"))
+        self.formLayout_Output.setWidget(0, QtGui.QFormLayout.FieldRole, self.spinBox_MaxFileSize)
+        self.checkBox_Quantize = QtGui.QCheckBox(self.groupBox_Output)
+        self.checkBox_Quantize.setObjectName(_fromUtf8("checkBox_Quantize"))
+        self.formLayout_Output.setWidget(1, QtGui.QFormLayout.LabelRole, self.checkBox_Quantize)
+        self.spinBox_QuantizeBits = QtGui.QSpinBox(self.groupBox_Output)
+        self.spinBox_QuantizeBits.setEnabled(False)
+        self.spinBox_QuantizeBits.setMinimum(8)
+        self.spinBox_QuantizeBits.setMaximum(24)
+        self.spinBox_QuantizeBits.setProperty("value", 16)
+        self.spinBox_QuantizeBits.setObjectName(_fromUtf8("spinBox_QuantizeBits"))
+        self.formLayout_Output.setWidget(1, QtGui.QFormLayout.FieldRole, self.spinBox_QuantizeBits)
+        self.checkBox_ZipBundle = QtGui.QCheckBox(self.groupBox_Output)
+        self.checkBox_ZipBundle.setObjectName(_fromUtf8("checkBox_ZipBundle"))
+        self.formLayout_Output.setWidget(2, QtGui.QFormLayout.SpanningRole, self.checkBox_ZipBundle)
+        self.checkBox_HashNames = QtGui.QCheckBox(self.groupBox_Output)
+        self.checkBox_HashNames.setObjectName(_fromUtf8("checkBox_HashNames"))
+        self.formLayout_Output.setWidget(3, QtGui.QFormLayout.SpanningRole, self.checkBox_HashNames)
+        self.checkBox_STL = QtGui.QCheckBox(self.groupBox_Output)
+        self.checkBox_STL.setObjectName(_fromUtf8("checkBox_STL"))
+        self.formLayout_Output.setWidget(4, QtGui.QFormLayout.SpanningRole, self.checkBox_STL)
+        self.checkBox_OBJ = QtGui.QCheckBox(self.groupBox_Output)
+        self.checkBox_OBJ.setObjectName(_fromUtf8("checkBox_OBJ"))
+        self.formLayout_Output.setWidget(5, QtGui.QFormLayout.SpanningRole, self.checkBox_OBJ)
+        self.gridLayout.addWidget(self.groupBox_Output, 5, 0, 1, 1)
         self.groupBox_3 = QtGui.QGroupBox(WorldPropertiesWidget)
         self.groupBox_3.setObjectName(_fromUtf8("groupBox_3"))
         self.verticalLayout_2 = QtGui.QVBoxLayout(self.groupBox_3)
@@ -124,6 +161,20 @@ class Ui_WorldPropertiesWidget(object):
 
     def retranslateUi(self, WorldPropertiesWidget):
         WorldPropertiesWidget.setWindowTitle(_translate("WorldPropertiesWidget", "Form", None))
+        self.groupBox_Output.setTitle(_translate("WorldPropertiesWidget", "Output", None))
+        self.label_MaxFileSize.setText(_translate("WorldPropertiesWidget", "Split data files at (KB)", None))
+        self.spinBox_MaxFileSize.setToolTip(_translate("WorldPropertiesWidget", "Start a new data file when the current one exceeds this size. 0 means no splitting.", None))
+        self.spinBox_MaxFileSize.setSpecialValueText(_translate("WorldPropertiesWidget", "No splitting", None))
+        self.checkBox_Quantize.setToolTip(_translate("WorldPropertiesWidget", "Write vector coordinates as integers on a grid. The grid interval is the plane width divided by 2 to the power of bits.", None))
+        self.checkBox_Quantize.setText(_translate("WorldPropertiesWidget", "Quantize vector coordinates (bits)", None))
+        self.checkBox_ZipBundle.setToolTip(_translate("WorldPropertiesWidget", "Write the HTML file, data files and library files into a single zip file instead of the output directory.", None))
+        self.checkBox_ZipBundle.setText(_translate("WorldPropertiesWidget", "Bundle output into a zip file", None))
+        self.checkBox_HashNames.setToolTip(_translate("WorldPropertiesWidget", "Name each data file by the hash of its content and write a manifest file. Unchanged files keep their names across exports.", None))
+        self.checkBox_HashNames.setText(_translate("WorldPropertiesWidget", "Name data files by content hash", None))
+        self.checkBox_STL.setToolTip(_translate("WorldPropertiesWidget", "Write DEM blocks (with sides and bottom if enabled) and extruded polygons to a binary STL file next to the HTML file.", None))
+        self.checkBox_STL.setText(_translate("WorldPropertiesWidget", "Write binary STL file", None))
+        self.checkBox_OBJ.setToolTip(_translate("WorldPropertiesWidget", "Write DEM blocks (with sides and bottom if enabled) and extruded polygons to a Wavefront OBJ file next to the HTML file.", None))
+        self.checkBox_OBJ.setText(_translate("WorldPropertiesWidget", "Write OBJ file", None))
         self.groupBox_3.setTitle(_translate("WorldPropertiesWidget", "Background", None))
         self.radioButton_Sky.setText(_translate("WorldPropertiesWidget", "Sky", None))
         self.radioButton_Color.setText(_translate("WorldPropertiesWidget", "Solid color", None))